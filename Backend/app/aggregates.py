@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .bulk import upsert_frame
+from .models import SeriesAggregate, TimeSeriesPoint
+from .rollup import ROLLUP_TZ
+
+PERIODS = ("day", "week", "month")
+
+
+def _local_bucket(ts: pd.Series, period: str) -> pd.Series:
+    """Bucket start (Europe/Berlin calendar, ISO weeks) for UTC timestamps, returned in UTC."""
+    local = ts.dt.tz_convert(ROLLUP_TZ).dt.tz_localize(None).dt.normalize()
+    if period == "week":
+        local = local - pd.to_timedelta(local.dt.weekday, unit="D")
+    elif period == "month":
+        local = local - pd.to_timedelta(local.dt.day - 1, unit="D")
+    # local midnights are never ambiguous in Europe/Berlin
+    return local.dt.tz_localize(ROLLUP_TZ).dt.tz_convert("UTC")
+
+
+def _bucket_bounds(period: str, start, end) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """[lo, hi) in UTC spanning the whole buckets that start..end touch."""
+    lo = _local_bucket(pd.Series([pd.Timestamp(start)]), period).iloc[0]
+    last = _local_bucket(pd.Series([pd.Timestamp(end)]), period).iloc[0].tz_convert(ROLLUP_TZ)
+    step = {"day": pd.DateOffset(days=1), "week": pd.DateOffset(weeks=1), "month": pd.DateOffset(months=1)}[period]
+    return lo, (last + step).tz_convert("UTC")
+
+
+def refresh_aggregates(db: Session, series_id: int, start, end, periods=PERIODS) -> int:
+    """
+    Recompute count/sum/min/max/sum of squares for every day/week/month bucket
+    of one series touched by [start, end]. Whole buckets are rebuilt from the
+    raw rows, so the result does not depend on what was already stored.
+    Runs inside the caller's transaction.
+    """
+    written = 0
+    for period in periods:
+        lo, hi = _bucket_bounds(period, start, end)
+        if db.get_bind().dialect.name == "postgresql":
+            written += _refresh_sql(db, series_id, period, lo, hi)
+        else:
+            written += _refresh_pandas(db, series_id, period, lo, hi)
+    return written
+
+
+def _refresh_sql(db: Session, series_id: int, period: str, lo, hi) -> int:
+    result = db.execute(
+        text(
+            f"""
+            INSERT INTO timeseries_agg (series_id, period, bucket, count, sum, min, max, sumsq)
+            SELECT :series_id, :period, b, COUNT(value), SUM(value), MIN(value), MAX(value), SUM(value * value)
+            FROM (
+                SELECT value, date_trunc('{period}', ts AT TIME ZONE :tz) AT TIME ZONE :tz AS b
+                FROM timeseries
+                WHERE series_id = :series_id
+                  AND ts >= :lo AND ts < :hi
+            ) q
+            GROUP BY b
+            ON CONFLICT (series_id, period, bucket) DO UPDATE SET
+                count = EXCLUDED.count,
+                sum = EXCLUDED.sum,
+                min = EXCLUDED.min,
+                max = EXCLUDED.max,
+                sumsq = EXCLUDED.sumsq
+            """
+        ),
+        {
+            "series_id": series_id,
+            "period": period,
+            "tz": ROLLUP_TZ,
+            "lo": lo.to_pydatetime(),
+            "hi": hi.to_pydatetime(),
+        },
+    )
+    return result.rowcount or 0
+
+
+def _refresh_pandas(db: Session, series_id: int, period: str, lo, hi) -> int:
+    T = TimeSeriesPoint
+    rows = (
+        db.query(T.ts, T.value)
+        .filter(T.series_id == series_id, T.ts >= lo.to_pydatetime(), T.ts < hi.to_pydatetime())
+        .all()
+    )
+    if not rows:
+        return 0
+
+    df = pd.DataFrame(rows, columns=["ts", "value"])
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    df["bucket"] = _local_bucket(df["ts"], period)
+    df["sq"] = df["value"] * df["value"]
+    g = df.groupby("bucket")
+    out = pd.DataFrame({
+        "count": g["value"].count(),
+        "sum": g["value"].sum(),
+        "min": g["value"].min(),
+        "max": g["value"].max(),
+        "sumsq": g["sq"].sum(),
+    }).reset_index()
+    out.insert(0, "period", period)
+    out.insert(0, "series_id", series_id)
+    return upsert_frame(db, SeriesAggregate.__table__, out, key_cols=["series_id", "period", "bucket"])
+
+
+def summarize(df: pd.DataFrame) -> pd.DataFrame:
+    """count/sum/sumsq columns -> mean and sample std."""
+    n = df["count"].astype(float)
+    mean = df["sum"] / n.where(n > 0)
+    var = (df["sumsq"] - df["sum"] * mean) / (n - 1).where(n > 1)
+    return df.assign(mean=mean, std=np.sqrt(var.clip(lower=0)))
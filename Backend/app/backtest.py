@@ -0,0 +1,244 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .db import Base, SessionLocal, engine
+from .forecast import (
+    BACKENDS, FIT_SECONDS, FORECAST_BACKEND, HORIZON_BUCKETS, MAX_HORIZON, MODES, WEATHER_COLS,
+    forecast_from_model, model_set, train_model, uses_direct,
+)
+from .models import BacktestResult, BacktestRun
+from .registry import history_table
+from .series import get_series_id
+from .store import to_utc
+from . import workers
+
+log = logging.getLogger("energy_api.backtest")
+
+HORIZONS = (6, 24, 72)
+# quantile of the pinball loss: under-forecasting load costs more than over-forecasting
+PINBALL_Q = 0.9
+# history every fold trains on at least
+MIN_HISTORY = pd.Timedelta(days=7)
+
+_tables: dict = {}   # per worker process: shared file -> feature table (memory-mapped)
+
+
+def _cutoff_range(table: pd.DataFrame, horizon: int) -> tuple[pd.Timestamp, pd.Timestamp]:
+    # at least MIN_HISTORY before a cutoff, `horizon` hours of actuals after it
+    return table["ts"].iloc[0] + MIN_HISTORY, table["ts"].iloc[-1] - pd.Timedelta(hours=horizon - 1)
+
+
+def rolling_cutoffs(table: pd.DataFrame, folds: int, every: pd.Timedelta, horizon: int) -> list[pd.Timestamp]:
+    """`folds` cutoffs `every` apart, the last one leaving `horizon` hours of actuals; earliest first."""
+    first, last = _cutoff_range(table, horizon)
+    return sorted(c for c in (last - k * every for k in range(folds)) if c >= first)
+
+
+def scores(actual: np.ndarray, pred: np.ndarray, q: float = PINBALL_Q) -> dict:
+    """MAE, MAPE (percent, zero actuals skipped) and pinball loss at quantile q of a point forecast."""
+    if len(actual) == 0:
+        return {"mae": None, "mape": None, "pinball": None}
+    e = actual - pred
+    nz = actual != 0
+    return {
+        "mae": float(np.mean(np.abs(e))),
+        "mape": float(np.mean(np.abs(e[nz] / actual[nz])) * 100) if nz.any() else None,
+        "pinball": float(np.mean(np.maximum(q * e, (q - 1) * e))),
+    }
+
+
+def _share(table: pd.DataFrame, directory: str) -> str:
+    # plain arrays, so the workers can memory-map them instead of unpickling a copy each
+    path = os.path.join(directory, "features.joblib")
+    cols = {c: table[c].to_numpy(dtype=np.float32) for c in table.columns if c != "ts"}
+    joblib.dump({"ts": table["ts"].dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[ns]"), **cols}, path)
+    return path
+
+
+def _shared(path: str) -> pd.DataFrame:
+    table = _tables.get(path)
+    if table is None:
+        cols = joblib.load(path, mmap_mode="r")
+        ts = pd.DatetimeIndex(cols.pop("ts")).tz_localize("UTC")
+        _tables.clear()
+        # copy=False keeps one block per column around the mapped arrays; consolidating
+        # them into a 2D block would copy the whole table into every worker
+        table = _tables[path] = pd.DataFrame({"ts": ts, **cols}, copy=False)
+    return table
+
+
+def run_fold(path: str, cutoff: pd.Timestamp, horizons: list[int], backend: str, modes: list[str], budget_s: float, quantile: float) -> list[dict]:
+    """
+    One fold, in a worker process: train on the hours before `cutoff`,
+    forecast max(horizons) hours and score every mode over 1..h hours.
+    Weather after the cutoff is taken as observed (a perfect weather forecast).
+    """
+    table = _shared(path)
+    horizon = max(horizons)
+    bundle = train_model(table, backend, budget_s, end=cutoff)
+    origin = bundle["tail"]["ts"].iloc[-1]
+    after = table[(table["ts"] > origin) & (table["ts"] <= origin + pd.Timedelta(hours=horizon))]
+    weather = after[["ts", *WEATHER_COLS]].dropna()
+    st = bundle["stats"]
+
+    rows = []
+    for mode in modes:
+        t = time.perf_counter()
+        pred = forecast_from_model(bundle, horizon, weather, mode)
+        predict_s = time.perf_counter() - t
+        if uses_direct(bundle, horizon, mode):
+            used = [d for (lo, _), d in zip(HORIZON_BUCKETS, st["direct"]) if lo <= horizon]
+        else:
+            used = [st["recursive"]]
+
+        actual = after.set_index("ts")["value"].reindex(pred["ts"]).to_numpy(dtype=float)
+        yhat = pred["yhat"].to_numpy(dtype=float)
+        for h in horizons:
+            ok = ~np.isnan(actual[:h])
+            rows.append({
+                "cutoff": cutoff.to_pydatetime(),
+                "mode": mode,
+                "horizon": h,
+                "points": int(ok.sum()),
+                **scores(actual[:h][ok], yhat[:h][ok], quantile),
+                "train_s": sum(d["fit_s"] for d in used),
+                "predict_s": predict_s,
+                "model_bytes": sum(d["size_bytes"] for d in used),
+            })
+    return rows
+
+
+def run_backtest(
+    db: Session,
+    region: str = "DE",
+    backends=(FORECAST_BACKEND,),
+    modes=MODES,
+    horizons=HORIZONS,
+    folds: int = 8,
+    every: pd.Timedelta = pd.Timedelta(days=1),
+    cutoffs=None,
+    budget_s: float = FIT_SECONDS,
+    quantile: float = PINBALL_Q,
+) -> list[int]:
+    """
+    Rolling-origin backtest of each backend over the stored history of a
+    region; one backtest_runs row per backend. The feature table is built
+    once and shared by all folds, which run in the worker processes.
+    Returns the run ids.
+    """
+    unknown = [b for b in backends if b not in BACKENDS] + [m for m in modes if m not in MODES]
+    if unknown:
+        raise ValueError(f"Unknown backend / mode: {', '.join(unknown)}")
+    horizons = sorted(set(horizons))
+    if not horizons or horizons[0] < 1 or horizons[-1] > MAX_HORIZON:
+        raise ValueError(f"horizons must be within 1..{MAX_HORIZON}")
+    load_id = get_series_id(db, region, "load", "hour")
+    if load_id is None:
+        raise ValueError(f"No hourly load series for region {region} yet.")
+
+    table = history_table(db, load_id)
+    if cutoffs:
+        first, last = _cutoff_range(table, horizons[-1])
+        cutoffs = sorted(c for c in map(to_utc, cutoffs) if first <= c <= last)
+        if not cutoffs:
+            raise ValueError(f"No cutoff within {first} .. {last} (the backtestable range of {region}).")
+    else:
+        cutoffs = rolling_cutoffs(table, folds, every, horizons[-1])
+        if not cutoffs:
+            raise ValueError(f"History of {region} is too short for a {horizons[-1]}h backtest.")
+
+    run_ids = []
+    with tempfile.TemporaryDirectory(prefix="backtest-") as tmp:
+        path = _share(table, tmp)
+        pool = workers.cpu_pool()
+        for backend in backends:
+            t0 = time.perf_counter()
+            futures = [pool.submit(run_fold, path, c, horizons, backend, list(modes), budget_s, quantile) for c in cutoffs]
+            results = [row for f in futures for row in f.result()]
+            run = BacktestRun(
+                created_at=pd.Timestamp.now(tz="UTC").to_pydatetime(),
+                region=region,
+                backend=backend,
+                feature_set=model_set(backend),
+                folds=len(cutoffs),
+                horizons=",".join(map(str, horizons)),
+                quantile=quantile,
+                budget_s=budget_s,
+                workers=workers.CPU_WORKERS,
+                wall_s=time.perf_counter() - t0,
+            )
+            db.add(run)
+            db.flush()
+            db.execute(insert(BacktestResult), [{"run_id": run.id, **r} for r in results])
+            db.commit()
+            log.info("backtest run %s: %s on %s, %d folds in %.1fs", run.id, backend, region, len(cutoffs), run.wall_s)
+            run_ids.append(run.id)
+    return run_ids
+
+
+def summary(db: Session, run_id: int) -> pd.DataFrame:
+    """Mean scores and cost per mode / horizon of a run."""
+    df = pd.read_sql_query(
+        BacktestResult.__table__.select().where(BacktestResult.run_id == run_id), db.connection(),
+    )
+    cols = ["mae", "mape", "pinball", "train_s", "predict_s", "model_bytes"]
+    return df.groupby(["mode", "horizon"])[cols].mean().join(df.groupby(["mode", "horizon"]).size().rename("folds"))
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        prog="python -m app.backtest",
+        description="Rolling-origin backtest of the forecast models over stored history. "
+        "Folds run in CPU_WORKERS processes; results go to backtest_runs / backtest_results (GET /backtests).",
+    )
+    p.add_argument("--region", default="DE")
+    p.add_argument("--backend", action="append", choices=list(BACKENDS), help=f"repeat to compare (default {FORECAST_BACKEND})")
+    p.add_argument("--mode", action="append", choices=list(MODES), help="default: all")
+    p.add_argument("--horizons", default=",".join(map(str, HORIZONS)), help="comma-separated hours")
+    p.add_argument("--folds", type=int, default=8)
+    p.add_argument("--every", default="24h", help="spacing of the rolling cutoffs")
+    p.add_argument("--cutoff", action="append", help="explicit cutoff (ISO 8601), repeatable; overrides --folds/--every")
+    p.add_argument("--budget", type=float, default=FIT_SECONDS, help="training time budget per model, seconds")
+    p.add_argument("--quantile", type=float, default=PINBALL_Q, help="quantile of the pinball loss")
+    args = p.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine, tables=[BacktestRun.__table__, BacktestResult.__table__])
+    db = SessionLocal()
+    try:
+        try:
+            run_ids = run_backtest(
+                db,
+                region=args.region,
+                backends=args.backend or [FORECAST_BACKEND],
+                modes=args.mode or list(MODES),
+                horizons=[int(h) for h in args.horizons.split(",")],
+                folds=args.folds,
+                every=pd.Timedelta(args.every),
+                cutoffs=args.cutoff,
+                budget_s=args.budget,
+                quantile=args.quantile,
+            )
+        except ValueError as e:
+            p.exit(1, f"{p.prog}: {e}\n")
+        for run_id in run_ids:
+            run = db.get(BacktestRun, run_id)
+            print(f"\nrun {run.id}: {run.backend} ({run.feature_set}) on {run.region}, "
+                  f"{run.folds} folds in {run.wall_s:.1f}s on {run.workers} workers")
+            print(summary(db, run_id).round(3).to_string())
+    finally:
+        db.close()
+        workers.shutdown()
+
+
+if __name__ == "__main__":
+    main()
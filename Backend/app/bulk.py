@@ -0,0 +1,91 @@
+import io
+
+import pandas as pd
+from sqlalchemy import Table, and_, delete, insert
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+
+
+def upsert_frame(db: Session, table: Table, df: pd.DataFrame, key_cols: list[str]) -> int:
+    """
+    Insert-or-update df into table on its unique key_cols, inside the
+    session's current transaction (the caller commits).
+
+    PostgreSQL: COPY into a temp staging table, then one
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE. Other databases fall back to
+    dialect upserts (SQLite) or delete-by-key + executemany insert.
+    """
+    if df.empty:
+        return 0
+
+    cols = list(df.columns)
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        _pg_copy_upsert(conn, table, df, cols, key_cols)
+    elif conn.dialect.name == "sqlite":
+        _sqlite_upsert(conn, table, df, cols, key_cols)
+    else:
+        _generic_upsert(conn, table, df, cols, key_cols)
+    return len(df)
+
+
+def _records(df: pd.DataFrame) -> list[dict]:
+    # NaN -> None so nullable columns store NULL
+    return df.astype(object).where(pd.notna(df), None).to_dict("records")
+
+
+def _pg_copy_upsert(conn, table: Table, df: pd.DataFrame, cols: list[str], key_cols: list[str]):
+    stage = f"_stage_{table.name}"
+    col_list = ", ".join(cols)
+    value_cols = [c for c in cols if c not in key_cols]
+
+    buf = io.StringIO()
+    df.to_csv(buf, header=False, index=False, na_rep="")
+    buf.seek(0)
+
+    raw = conn.connection.dbapi_connection
+    with raw.cursor() as cur:
+        # staging table lives until the ingestion transaction ends
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DROP AS "
+            f"SELECT {col_list} FROM {table.name} WITH NO DATA"
+        )
+        cur.execute(f"TRUNCATE {stage}")
+        cur.copy_expert(f"COPY {stage} ({col_list}) FROM STDIN WITH (FORMAT csv)", buf)
+
+        if value_cols:
+            updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in value_cols)
+            # skip rows whose values did not change -> no dead tuples for re-sent data
+            changed = " OR ".join(f"{table.name}.{c} IS DISTINCT FROM EXCLUDED.{c}" for c in value_cols)
+            on_conflict = f"DO UPDATE SET {updates} WHERE {changed}"
+        else:
+            on_conflict = "DO NOTHING"
+
+        cur.execute(
+            f"INSERT INTO {table.name} ({col_list}) "
+            f"SELECT {col_list} FROM {stage} "
+            f"ON CONFLICT ({', '.join(key_cols)}) {on_conflict}"
+        )
+
+
+def _sqlite_upsert(conn, table: Table, df: pd.DataFrame, cols: list[str], key_cols: list[str]):
+    stmt = sqlite.insert(table)
+    value_cols = [c for c in cols if c not in key_cols]
+    if value_cols:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_cols,
+            set_={c: stmt.excluded[c] for c in value_cols},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=key_cols)
+    conn.execute(stmt, _records(df))
+
+
+def _generic_upsert(conn, table: Table, df: pd.DataFrame, cols: list[str], key_cols: list[str]):
+    # key range delete, then executemany insert (no ORM objects)
+    ts_key = key_cols[-1]
+    conds = [table.c[ts_key] >= df[ts_key].min(), table.c[ts_key] <= df[ts_key].max()]
+    for k in key_cols[:-1]:
+        conds.append(table.c[k].in_(df[k].unique().tolist()))
+    conn.execute(delete(table).where(and_(*conds)))
+    conn.execute(insert(table), _records(df))
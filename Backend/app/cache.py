@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from email.utils import format_datetime, parsedate_to_datetime
+
+import pandas as pd
+from fastapi import Request
+from fastapi.responses import Response
+
+# in-process response cache budget; 0 disables it
+RESPONSE_CACHE_MB = int(os.getenv("RESPONSE_CACHE_MB", "128"))
+
+
+def _size(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    return len(value) if isinstance(value, (bytes, bytearray)) else 1024
+
+
+class ResponseCache:
+    """
+    LRU over computed results, bounded by their approximate size in bytes.
+    Each entry lists the data versions it was built from (see versions.py),
+    so an ingest can drop exactly the entries whose series changed. Callers
+    put the versions into the key as well, which keeps other worker processes
+    correct without any cross-process invalidation.
+
+    Concurrent misses on the same key are computed once: the other callers
+    wait for the first one and get its result.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size, deps)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: dict = {}
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _store(self, key, deps, value):
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (value, size, frozenset(deps))
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    async def aget_or_compute(self, key, deps, compute):
+        """Cached value for key, else await compute() once (results are shared: treat them as read-only)."""
+        if self.max_bytes <= 0:
+            return await compute()
+        with self._lock:
+            value = self._lookup(key)
+        if value is not None:
+            return value
+
+        gate = self._inflight.setdefault(key, asyncio.Lock())
+        async with gate:
+            with self._lock:
+                value = self._lookup(key)
+            if value is not None:
+                return value
+            try:
+                value = await compute()
+                with self._lock:
+                    self._store(key, deps, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, names):
+        """Drop every entry built from one of the given data versions."""
+        names = set(names)
+        with self._lock:
+            for key in [k for k, (_, _, deps) in self._entries.items() if deps & names]:
+                _, size, _ = self._entries.pop(key)
+                self._bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MB * 1024 * 1024)
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over the request parameters, representation and data versions."""
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:24] + '"'
+
+
+def is_fresh(request: Request, etag: str, last_modified: pd.Timestamp | None) -> bool:
+    """If-None-Match wins over If-Modified-Since (RFC 9110)."""
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+        return "*" in tags or etag in tags
+
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have second precision
+        return since is not None and since.tzinfo is not None and last_modified.floor("s") <= pd.Timestamp(since)
+    return False
+
+
+def with_validators(response: Response, etag: str, last_modified: pd.Timestamp | None) -> Response:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(last_modified.to_pydatetime(), usegmt=True)
+    # clients may keep the body but must revalidate; the answer depends on Accept
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def not_modified(etag: str, last_modified: pd.Timestamp | None) -> Response:
+    return with_validators(Response(status_code=304), etag, last_modified)
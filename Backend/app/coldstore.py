@@ -0,0 +1,177 @@
+import logging
+import os
+import threading
+
+import pandas as pd
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+try:
+    import duckdb
+except ImportError:  # optional: the columnar tier is simply disabled
+    duckdb = None
+
+from .models import SeriesAggregate, TimeSeriesPoint
+from .partitions import month_start
+
+log = logging.getLogger("energy_api.coldstore")
+
+# Parquet tier root; empty disables the tier and every read goes to the database
+COLD_STORE_DIR = os.getenv("COLD_STORE_DIR", "")
+# a month is exported once it ended this many days ago (SMARD stops revising it)
+COLD_AFTER_DAYS = int(os.getenv("COLD_AFTER_DAYS", "14"))
+
+_duck = None
+_duck_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(COLD_STORE_DIR) and duckdb is not None
+
+
+def _conn():
+    global _duck
+    if _duck is None:
+        with _duck_lock:
+            if _duck is None:
+                con = duckdb.connect()
+                con.execute("SET TimeZone = 'UTC'")
+                _duck = con
+    # one cursor per query: duckdb connections are not shared across threads
+    return _duck.cursor()
+
+
+def _series_dir(series_id: int) -> str:
+    return os.path.join(COLD_STORE_DIR, f"series_id={series_id}")
+
+
+def _month_path(series_id: int, month: pd.Timestamp) -> str:
+    return os.path.join(_series_dir(series_id), f"month={month:%Y-%m}", "data.parquet")
+
+
+def cold_until(series_id: int) -> pd.Timestamp | None:
+    """
+    Exclusive UTC end of the Parquet-covered history of a series, or None.
+    Months are exported oldest-first, so everything before this is in Parquet.
+    """
+    if not enabled():
+        return None
+    try:
+        months = [d[len("month="):] for d in os.listdir(_series_dir(series_id)) if d.startswith("month=")]
+    except FileNotFoundError:
+        return None
+    if not months:
+        return None
+    return pd.Timestamp(f"{max(months)}-01", tz="UTC") + pd.DateOffset(months=1)
+
+
+def read_cold(series_id: int, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """ts, value with start <= ts <= end from the Parquet tier, ordered by ts."""
+    pattern = os.path.join(_series_dir(series_id), "month=*", "*.parquet")
+    return _conn().execute(
+        f"SELECT ts, value FROM read_parquet('{pattern}') WHERE ts >= ? AND ts <= ? ORDER BY ts",
+        [start.to_pydatetime(), end.to_pydatetime()],
+    ).df()
+
+
+def cold_months(series_id: int, start: pd.Timestamp, end: pd.Timestamp) -> list[pd.Timestamp]:
+    """Exported months of a series that overlap [start, end], oldest first."""
+    if not enabled():
+        return []
+    try:
+        names = os.listdir(_series_dir(series_id))
+    except FileNotFoundError:
+        return []
+    months = sorted(pd.Timestamp(f"{d[len('month='):]}-01", tz="UTC") for d in names if d.startswith("month="))
+    return [m for m in months if m <= end and m + pd.DateOffset(months=1) > start]
+
+
+def read_cold_month(series_id: int, month: pd.Timestamp, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """One exported month, clipped to [start, end]; lets exports stream month by month."""
+    return _conn().execute(
+        "SELECT ts, value FROM read_parquet(?) WHERE ts >= ? AND ts <= ? ORDER BY ts",
+        [_month_path(series_id, month), start.to_pydatetime(), end.to_pydatetime()],
+    ).df()
+
+
+def _read_month(db: Session, series_id: int, month: pd.Timestamp) -> pd.DataFrame:
+    T = TimeSeriesPoint
+    rows = (
+        db.query(T.ts, T.value)
+        .filter(T.series_id == series_id)
+        .filter(T.ts >= month.to_pydatetime(), T.ts < (month + pd.DateOffset(months=1)).to_pydatetime())
+        .order_by(T.ts.asc())
+        .all()
+    )
+    df = pd.DataFrame(rows, columns=["ts", "value"])
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    return df
+
+
+def _write_month(path: str, df: pd.DataFrame):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def refresh_cold_months(db: Session, windows: dict) -> int:
+    """
+    Rewrite the exported months overlapping {series_id: (lo, hi)} windows that
+    were just written to the database (a refetched chunk, a late revision):
+    reads before cold_until only see Parquet. Database rows replace file rows
+    with the same ts; the other file rows stay, in case the month's partition
+    was archived since. Returns the number of files rewritten.
+    """
+    if not enabled():
+        return 0
+
+    written = 0
+    for sid, (lo, hi) in windows.items():
+        for month in cold_months(sid, pd.Timestamp(lo), pd.Timestamp(hi)):
+            end = month + pd.DateOffset(months=1) - pd.Timedelta(microseconds=1)
+            old = read_cold_month(sid, month, month, end)
+            old["ts"] = pd.to_datetime(old["ts"], utc=True)
+            df = (
+                pd.concat([old, _read_month(db, sid, month)], ignore_index=True)
+                .drop_duplicates("ts", keep="last")
+                .sort_values("ts")
+            )
+            _write_month(_month_path(sid, month), df)
+            written += 1
+            log.info("re-exported series %s month %s (%d rows)", sid, f"{month:%Y-%m}", len(df))
+    return written
+
+
+def export_cold_months(db: Session) -> int:
+    """
+    Write every closed, not yet exported (series, month) to
+    COLD_STORE_DIR/series_id=<id>/month=<YYYY-MM>/data.parquet.
+    Returns the number of files written.
+    """
+    if not enabled():
+        return 0
+
+    boundary = month_start(pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=COLD_AFTER_DAYS))
+    A = SeriesAggregate
+    # first month per series from the (small) monthly aggregates, not a scan of timeseries
+    firsts = (
+        db.query(A.series_id, func.min(A.bucket))
+        .filter(A.period == "month")
+        .group_by(A.series_id)
+        .all()
+    )
+
+    written = 0
+    for sid, first in firsts:
+        for month in pd.date_range(month_start(first), boundary, freq="MS", inclusive="left"):
+            path = _month_path(sid, month)
+            if os.path.exists(path):
+                continue
+            df = _read_month(db, sid, month)
+            if df.empty:
+                continue
+            _write_month(path, df)
+            written += 1
+            log.info("exported series %s month %s (%d rows)", sid, f"{month:%Y-%m}", len(df))
+    return written
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+METHODS = ("minmax", "lttb")
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min and max of each of n_out // 2 equal-count buckets, plus the first and
+    last point. Every local extreme survives, so threshold peaks are kept.
+    """
+    N = len(y)
+    n_buckets = max(1, (n_out - 2) // 2)
+    if N <= n_out:
+        return np.arange(N)
+
+    bucket = (np.arange(N) * n_buckets) // N
+    # within each bucket, lexsort puts the min first and the max last
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets), side="left")
+    ends = np.append(starts[1:], N) - 1
+    idx = np.concatenate(([0, N - 1], order[starts], order[ends]))
+    return np.unique(idx)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets. The triangle areas within a bucket are
+    computed vectorized; the loop only runs once per output point.
+    """
+    N = len(x)
+    if N <= n_out or n_out < 3:
+        return np.arange(N)
+
+    edges = np.linspace(1, N - 1, n_out - 1).astype(np.int64)  # n_out - 2 inner buckets
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, N - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else N)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def downsample(df: pd.DataFrame, max_points: int, method: str = "minmax") -> pd.DataFrame:
+    """Reduce an ordered ts/value frame to at most max_points rows (NaN rows are dropped)."""
+    df = df.dropna(subset=["value"])
+    if max_points is None or len(df) <= max_points:
+        return df
+
+    y = df["value"].to_numpy(dtype=float)
+    if method == "lttb":
+        x = (df["ts"] - df["ts"].iloc[0]).dt.total_seconds().to_numpy()
+        idx = lttb_indices(x, y, max_points)
+    else:
+        idx = minmax_indices(y, max_points)
+    return df.iloc[idx].reset_index(drop=True)
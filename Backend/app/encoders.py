@@ -0,0 +1,208 @@
+import io
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: binary formats answer 406 without it
+    pa = None
+    pq = None
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+# ?format= value / Accept media type -> format
+_FORMATS = {
+    "json": "json",
+    "arrow": "arrow",
+    "parquet": "parquet",
+    "application/json": "json",
+    ARROW_STREAM: "arrow",
+    PARQUET: "parquet",
+    "application/x-parquet": "parquet",
+}
+
+# rows serialized per streamed chunk
+CHUNK_ROWS = 10_000
+
+
+def iso_utc(ts: pd.Series) -> np.ndarray:
+    """Vectorized tz-aware (UTC) timestamps -> 'YYYY-MM-DDTHH:MM:SSZ' strings."""
+    naive = ts.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[s]")
+    return np.char.add(np.datetime_as_string(naive, unit="s"), "Z")
+
+
+def _records_chunks(df: pd.DataFrame, ts_col: str, value_cols: list[str]):
+    yield b"["
+    for i in range(0, len(df), CHUNK_ROWS):
+        part = df.iloc[i:i + CHUNK_ROWS]
+        ts = iso_utc(part[ts_col]).tolist()
+        cols = [part[c].to_numpy(dtype=float).tolist() for c in value_cols]
+        rows = [dict(zip([ts_col, *value_cols], vals)) for vals in zip(ts, *cols)]
+        body = orjson.dumps(rows)[1:-1]  # strip the list brackets, we stream our own
+        if i:
+            yield b","
+        yield body
+    yield b"]"
+
+
+def _columnar_chunks(df: pd.DataFrame, ts_col: str, value_cols: list[str]):
+    yield b"{"
+    for n, col in enumerate([ts_col, *value_cols]):
+        if n:
+            yield b","
+        yield orjson.dumps(col) + b":["
+        for i in range(0, len(df), CHUNK_ROWS):
+            part = df[col].iloc[i:i + CHUNK_ROWS]
+            arr = iso_utc(part).tolist() if col == ts_col else part.to_numpy(dtype=float)
+            if i:
+                yield b","
+            yield orjson.dumps(arr, option=orjson.OPT_SERIALIZE_NUMPY)[1:-1]
+        yield b"]"
+    yield b"}"
+
+
+def json_response(df: pd.DataFrame, shape: str = "records", ts_col: str = "ts", value_cols=("value",)) -> StreamingResponse:
+    """
+    Stream df as JSON without per-row pydantic validation.
+    shape="records": [{"ts": ..., "value": ...}, ...]   (the /timeseries contract)
+    shape="columnar": {"ts": [...], "value": [...]}
+    NaN values are written as null.
+    """
+    value_cols = list(value_cols)
+    chunks = _columnar_chunks if shape == "columnar" else _records_chunks
+    return StreamingResponse(chunks(df, ts_col, value_cols), media_type="application/json")
+
+
+def _arrow_table(df: pd.DataFrame, ts_col: str, value_cols: list[str]):
+    # typed columns straight from the numpy buffers: timestamp[us, UTC] + float64
+    return pa.table({
+        ts_col: pa.array(df[ts_col].dt.tz_convert("UTC"), type=pa.timestamp("us", tz="UTC")),
+        **{c: pa.array(df[c].to_numpy(dtype=np.float64), type=pa.float64()) for c in value_cols},
+    })
+
+
+def negotiate(request: Request, fmt: str | None = None) -> str:
+    """json | arrow | parquet from ?format=, else the first known Accept media type."""
+    if fmt:
+        if fmt not in _FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unknown format {fmt!r} (json | arrow | parquet).")
+        return _FORMATS[fmt]
+    for part in request.headers.get("accept", "").split(","):
+        media = part.split(";")[0].strip().lower()
+        if media in _FORMATS:
+            return _FORMATS[media]
+    return "json"
+
+
+def frame_response(
+    request: Request,
+    df: pd.DataFrame,
+    fmt: str | None = None,
+    shape: str = "records",
+    ts_col: str = "ts",
+    value_cols=("value",),
+) -> Response:
+    """
+    JSON (streamed), Arrow IPC stream or Parquet depending on ?format= / Accept.
+    Binary formats keep timestamps and float64 values typed end to end.
+    """
+    kind = negotiate(request, fmt)
+    value_cols = list(value_cols)
+    if kind == "json":
+        return json_response(df, shape=shape, ts_col=ts_col, value_cols=value_cols)
+    if pa is None:
+        raise HTTPException(status_code=406, detail="pyarrow is not installed on the API server.")
+
+    table = _arrow_table(df, ts_col, value_cols)
+    if kind == "arrow":
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), media_type=ARROW_STREAM)
+
+    buf = io.BytesIO()
+    pq.write_table(table, buf)
+    return Response(buf.getvalue(), media_type=PARQUET)
+
+
+# /export: long rows (metric, ts, value), one encoded chunk per batch
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": PARQUET}
+
+
+def _csv_batch(name: str, df: pd.DataFrame) -> bytes:
+    out = pd.DataFrame({"metric": name, "ts": iso_utc(df["ts"]), "value": df["value"].to_numpy(dtype=float)})
+    return out.to_csv(index=False, header=False, lineterminator="\n").encode()
+
+
+def _ndjson_batch(name: str, df: pd.DataFrame) -> bytes:
+    ts = iso_utc(df["ts"]).tolist()
+    values = df["value"].to_numpy(dtype=float).tolist()
+    return b"".join(orjson.dumps({"metric": name, "ts": t, "value": v}) + b"\n" for t, v in zip(ts, values))
+
+
+class _ByteSink:
+    """Write-only file object for ParquetWriter; drain() hands over what was written so far."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self._pos = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out, self._parts = b"".join(self._parts), []
+        return out
+
+
+async def export_stream(batches, fmt: str):
+    """
+    Encode an async iterator of (metric, ts/value frame) as CSV, NDJSON or
+    Parquet (one row group per batch). Encoding runs in the threadpool; only
+    one batch is held in memory at a time.
+    """
+    if fmt == "parquet":
+        sink = _ByteSink()
+        schema = pa.schema([
+            ("metric", pa.string()),
+            ("ts", pa.timestamp("us", tz="UTC")),
+            ("value", pa.float64()),
+        ])
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            async for name, df in batches:
+                table = _arrow_table(df, "ts", ["value"])
+                table = table.add_column(0, "metric", pa.array([name] * len(df), type=pa.string()))
+                await run_in_threadpool(writer.write_table, table)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+        return
+
+    encode = _ndjson_batch if fmt == "ndjson" else _csv_batch
+    if fmt == "csv":
+        yield b"metric,ts,value\n"
+    async for name, df in batches:
+        yield await run_in_threadpool(encode, name, df)
@@ -0,0 +1,106 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from .models import AlertEvent, AlertRule
+from .store import read_series, to_utc
+
+log = logging.getLogger("energy_api.events")
+
+OPS = {"above": np.greater, "below": np.less}
+
+# nominal length of one point per resolution (duration of a run = end - start + step)
+RESOLUTION_STEP = {
+    "quarterhour": pd.Timedelta(minutes=15),
+    "hour": pd.Timedelta(hours=1),
+    "day": pd.Timedelta(days=1),
+}
+# largest ts difference that still counts as consecutive (local days can last 25h)
+RESOLUTION_GAP = {**RESOLUTION_STEP, "day": pd.Timedelta(hours=25)}
+
+HISTORY_START = pd.Timestamp("2000-01-01", tz="UTC")
+
+
+def find_runs(df: pd.DataFrame, op: str, threshold: float, max_gap: pd.Timedelta) -> pd.DataFrame:
+    """
+    Run-length encode the points of an ordered ts/value frame that violate
+    (op, threshold): start_ts, end_ts, peak, peak_ts, points per run. A
+    missing point (ts step > max_gap) or a NaN ends a run.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=["start_ts", "end_ts", "peak", "peak_ts", "points"])
+
+    v = df["value"].to_numpy(dtype=float)
+    ts = df["ts"]
+    hit = OPS[op](v, threshold)  # NaN compares False
+    prev_hit = np.concatenate(([False], hit[:-1]))
+    contiguous = np.concatenate(([False], (ts.diff().iloc[1:] <= max_gap).to_numpy()))
+    run_id = np.cumsum(hit & ~(prev_hit & contiguous))
+
+    hits = pd.DataFrame({"run": run_id[hit], "ts": ts[hit].to_numpy(), "value": v[hit]})
+    g = hits.groupby("run")
+    peak_idx = g["value"].idxmax() if op == "above" else g["value"].idxmin()
+    return pd.DataFrame({
+        "start_ts": g["ts"].min(),
+        "end_ts": g["ts"].max(),
+        "peak": hits["value"].loc[peak_idx].to_numpy(),
+        "peak_ts": hits["ts"].loc[peak_idx].to_numpy(),
+        "points": g["value"].size(),
+    }).reset_index(drop=True)
+
+
+def evaluate_rule(db: Session, rule: AlertRule, resolution: str, lo, hi) -> int:
+    """
+    Rebuild the events of one rule for points in [lo, hi]. Stored events that
+    overlap or touch the window are widened into it first, so runs that
+    continue across its edges are merged rather than split.
+    Runs inside the caller's transaction; returns the number of events written.
+    """
+    E = AlertEvent
+    gap = RESOLUTION_GAP.get(resolution, pd.Timedelta(hours=1))
+    lo, hi = to_utc(lo), to_utc(hi)
+
+    first, last = db.execute(
+        select(func.min(E.start_ts), func.max(E.end_ts))
+        .where(E.rule_id == rule.id, E.start_ts <= (hi + gap).to_pydatetime(), E.end_ts >= (lo - gap).to_pydatetime())
+    ).one()
+    if first is not None:
+        lo, hi = min(lo, to_utc(first)), max(hi, to_utc(last))
+
+    db.execute(delete(E).where(E.rule_id == rule.id, E.start_ts >= lo.to_pydatetime(), E.start_ts <= hi.to_pydatetime()))
+    runs = find_runs(read_series(db, rule.series_id, lo, hi), rule.op, rule.threshold, gap)
+    if runs.empty:
+        return 0
+
+    runs["start_ts"] = pd.to_datetime(runs["start_ts"], utc=True)
+    runs["end_ts"] = pd.to_datetime(runs["end_ts"], utc=True)
+    runs["peak_ts"] = pd.to_datetime(runs["peak_ts"], utc=True)
+    records = [
+        {
+            "rule_id": rule.id,
+            "start_ts": r.start_ts.to_pydatetime(),
+            "end_ts": r.end_ts.to_pydatetime(),
+            "peak": float(r.peak),
+            "peak_ts": r.peak_ts.to_pydatetime(),
+            "points": int(r.points),
+        }
+        for r in runs.itertuples(index=False)
+    ]
+    db.execute(insert(E), records)
+    return len(records)
+
+
+def evaluate_series(db: Session, series_id: int, resolution: str, lo, hi) -> int:
+    """Incremental evaluation of every rule on a series after [lo, hi] was (re)written."""
+    rules = db.execute(select(AlertRule).where(AlertRule.series_id == series_id)).scalars().all()
+    return sum(evaluate_rule(db, rule, resolution, lo, hi) for rule in rules)
+
+
+def backfill_rule(db: Session, rule: AlertRule, resolution: str) -> int:
+    """Evaluate a newly registered rule over the whole history of its series."""
+    written = evaluate_rule(db, rule, resolution, HISTORY_START, pd.Timestamp.now(tz="UTC") + pd.Timedelta(days=1))
+    log.info("rule %s (%s %s): %d events backfilled", rule.id, rule.op, rule.threshold, written)
+    return written
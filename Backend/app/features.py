@@ -0,0 +1,98 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .bulk import upsert_frame
+from .forecast import TABLE_COLS, feature_table, join_weather
+from .models import FeatureRow
+from .series import get_series_id, load_catalog, series_keys
+from .store import read_series, read_weather, to_utc, weather_range
+
+log = logging.getLogger("energy_api.features")
+
+# how far back the features of an hour look (lag_2, roll_6) ...
+LOOKBACK = pd.Timedelta(hours=5)
+# ... and how far the weather match reaches (join_weather tolerance)
+WEATHER_TOLERANCE = pd.Timedelta(hours=2)
+
+
+def hourly_load_ids(db: Session) -> list[int]:
+    load_catalog(db)
+    return sorted(get_series_id(db, r, m, res) for r, m, res in series_keys() if m == "load" and res == "hour")
+
+
+def refresh_features(db: Session, load_id: int, lo, hi) -> int:
+    """
+    Recompute the stored feature rows of [lo, hi] and of the hours after it
+    whose lags / rolling mean reach into it, from that window (plus lookback)
+    of load and weather only. Runs inside the caller's transaction; returns
+    the number of rows written.
+    """
+    F = FeatureRow
+    lo, hi = to_utc(lo), to_utc(hi) + LOOKBACK
+    load = read_series(db, load_id, lo - LOOKBACK, hi)
+    weather = read_weather(db, lo - LOOKBACK - WEATHER_TOLERANCE, hi + WEATHER_TOLERANCE)
+    table = feature_table(join_weather(load, weather))
+    rows = table[(table["ts"] >= lo) & (table["ts"] <= hi) & table["value"].notna()]
+
+    db.execute(delete(F).where(F.series_id == load_id, F.ts >= lo.to_pydatetime(), F.ts <= hi.to_pydatetime()))
+    out = rows[TABLE_COLS].astype(np.float32)
+    out.insert(0, "ts", rows["ts"])
+    out.insert(0, "series_id", load_id)
+    return upsert_frame(db, F.__table__, out, key_cols=["series_id", "ts"])
+
+
+def build_features(db: Session, load_id: int) -> int:
+    """Feature rows of the whole load + weather overlap (first ingest of a series)."""
+    w_min, w_max = weather_range(db)
+    if pd.isna(w_min) or pd.isna(w_max):
+        return 0
+    return refresh_features(db, load_id, w_min, w_max)
+
+
+def _has_features(db: Session, load_id: int) -> bool:
+    return db.execute(select(FeatureRow.ts).where(FeatureRow.series_id == load_id).limit(1)).first() is not None
+
+
+def update_features(db: Session, load_windows: dict, weather_window: tuple | None) -> int:
+    """
+    After ingestion: rewrite the feature rows of every hourly load series
+    where its load (load_windows: series id -> (lo, hi)) or the weather
+    changed; series without stored features are built in full.
+    """
+    written = 0
+    for load_id in hourly_load_ids(db):
+        if not _has_features(db, load_id):
+            written += build_features(db, load_id)
+            continue
+        for window in (load_windows.get(load_id), weather_window):
+            if window is not None:
+                written += refresh_features(db, load_id, *window)
+    return written
+
+
+def read_features(db: Session, load_id: int, start=None, end=None) -> pd.DataFrame:
+    """
+    Stored features of a load series as a float32 feature_table: one row
+    per hour from the first to the last stored one, hours without a row NaN.
+    """
+    F = FeatureRow
+    q = select(F.ts, *(getattr(F, c) for c in TABLE_COLS)).where(F.series_id == load_id).order_by(F.ts)
+    if start is not None:
+        q = q.where(F.ts >= to_utc(start).to_pydatetime())
+    if end is not None:
+        q = q.where(F.ts <= to_utc(end).to_pydatetime())
+    df = pd.DataFrame.from_records(db.execute(q).all(), columns=["ts", *TABLE_COLS])
+    if df.empty:
+        return df
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    df[TABLE_COLS] = df[TABLE_COLS].astype(np.float32)
+
+    grid = pd.date_range(df["ts"].iloc[0], df["ts"].iloc[-1], freq="h", name="ts")
+    df = df.set_index("ts").reindex(grid)
+    df["hour"] = grid.hour.astype(np.float32)
+    df["dow"] = grid.dayofweek.astype(np.float32)
+    return df.reset_index()
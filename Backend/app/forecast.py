@@ -1,6 +1,46 @@
+import os
+import pickle
+import time
+
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from .workers import CPU_WORKERS
+
+FEATURE_COLS = ["hour","dow","lag_1","lag_2","roll_6","temperature_2m","windspeed_10m","precipitation"]
+WEATHER_COLS = ["temperature_2m","windspeed_10m","precipitation"]
+# direct models: horizon, calendar + weather of the target hour, load known at the forecast origin
+DIRECT_FEATURE_COLS = ["h","hour","dow","lag_1","lag_2","roll_6","temperature_2m","windspeed_10m","precipitation"]
+# columns of feature_table() besides ts
+TABLE_COLS = ["value","hour","dow","lag_1","lag_2","roll_6","temperature_2m","windspeed_10m","precipitation"]
+
+# part of every model key (with the backend): bump when the features change
+FEATURE_SET = "lag2-roll6-weather3-v2"
+
+# estimator behind every model: rf | hgb | ridge (see BACKENDS)
+FORECAST_BACKEND = os.getenv("FORECAST_BACKEND", "rf")
+# training time budget per fitted model, seconds; growing models stop adding trees / iterations when it is spent
+FIT_SECONDS = float(os.getenv("FORECAST_FIT_SECONDS", "120"))
+# size budgets: trees of the random forest, boosting iterations
+RF_TREES = int(os.getenv("RF_TREES", "200"))
+HGB_MAX_ITER = int(os.getenv("HGB_MAX_ITER", "300"))
+# cores per random forest fit; fits run in CPU_WORKERS processes at once, so
+# by default each gets its share of the machine (-1 would give all of them to every fit)
+FORECAST_N_JOBS = int(os.getenv("FORECAST_N_JOBS") or max(1, (os.cpu_count() or 1) // CPU_WORKERS))
+
+# rows of the training frame a model keeps for inference (lags / rolling window)
+TAIL_ROWS = 24
+
+MODES = ("direct", "recursive")
+# direct mode: one model per horizon bucket (hours ahead, inclusive)
+HORIZON_BUCKETS = ((1, 6), (7, 24), (25, 72))
+MAX_HORIZON = HORIZON_BUCKETS[-1][1]
+# training rows per bucket model; forecast origins are subsampled beyond that
+DIRECT_MAX_ROWS = 10_000
 
 def make_features(df: pd.DataFrame) -> pd.DataFrame:
     df = df.sort_values("ts").copy()
@@ -11,48 +51,255 @@ def make_features(df: pd.DataFrame) -> pd.DataFrame:
     df["roll_6"] = df["value"].rolling(6).mean()
     return df
 
-def train_and_forecast(df_joined: pd.DataFrame, horizon: int = 24) -> pd.DataFrame:
+def join_weather(df_load: pd.DataFrame, df_weather: pd.DataFrame) -> pd.DataFrame:
+    """Nearest weather hour (within 2h) for every load row; rows without weather are dropped."""
+    df_load = df_load.assign(ts=pd.to_datetime(df_load["ts"], utc=True))
+    df_weather = df_weather.assign(ts=pd.to_datetime(df_weather["ts"], utc=True))
+    return pd.merge_asof(
+        df_load.sort_values("ts"),
+        df_weather.sort_values("ts"),
+        on="ts",
+        direction="nearest",
+        tolerance=pd.Timedelta("2h"),
+    ).dropna(subset=WEATHER_COLS)
+
+class Backend:
     """
-    df_joined columns: ts, value (load), temperature_2m, windspeed_10m, precipitation
+    An estimator factory with its budgets. Models that can warm start grow
+    `step` units of `grow` (trees, boosting iterations) at a time up to
+    `size`, and stop early when the next step would overrun the time budget.
     """
-    df = make_features(df_joined).dropna().copy()
-    feature_cols = ["hour","dow","lag_1","lag_2","roll_6","temperature_2m","windspeed_10m","precipitation"]
 
-    X = df[feature_cols]
-    y = df["value"]
+    def __init__(self, name: str, make, grow: str | None = None, size: int = 0, step: int = 0):
+        self.name = name
+        self.make = make
+        self.grow = grow
+        self.size = size
+        self.step = step
 
-    model = RandomForestRegressor(n_estimators=200, random_state=42)
-    model.fit(X, y)
+    @property
+    def key(self) -> str:
+        """Part of the model key: name and size budget, e.g. rf200."""
+        return f"{self.name}{self.size or ''}"
 
-    # naive recursive forecast: use last rows and roll forward
-    last = df_joined.sort_values("ts").copy()
-    preds = []
-    for i in range(horizon):
-        next_ts = last["ts"].iloc[-1] + pd.Timedelta(hours=1)
-
-        # take last known weather row if future not available in DB yet
-        w = last.iloc[-1][["temperature_2m","windspeed_10m","precipitation"]].to_dict()
-
-        temp = w.get("temperature_2m", np.nan)
-        wind = w.get("windspeed_10m", np.nan)
-        precip = w.get("precipitation", np.nan)
-
-        # build feature row from last known values
-        value_series = last["value"].astype(float)
-        row = {
-            "hour": next_ts.hour,
-            "dow": next_ts.dayofweek,
-            "lag_1": float(value_series.iloc[-1]),
-            "lag_2": float(value_series.iloc[-2]) if len(value_series) > 1 else float(value_series.iloc[-1]),
-            "roll_6": float(value_series.tail(6).mean()),
-            "temperature_2m": temp,
-            "windspeed_10m": wind,
-            "precipitation": precip,
+    def fit(self, X: np.ndarray, y: np.ndarray, budget_s: float = FIT_SECONDS):
+        """Fitted model and its cost: fit_s, units (trees / iterations), size_bytes, predict_ms."""
+        t0 = time.perf_counter()
+        model = self.make()
+        if self.grow is None:
+            model.fit(X, y)
+        else:
+            n = 0
+            while n < self.size:
+                n = min(self.size, n + self.step)
+                t = time.perf_counter()
+                model.set_params(**{self.grow: n})
+                model.fit(X, y)
+                if time.perf_counter() - t0 + (time.perf_counter() - t) > budget_s:
+                    break
+        fit_s = time.perf_counter() - t0
+
+        # inference runs on a few dozen rows at a time: no thread fan-out there
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=1)
+        units = getattr(model, "n_iter_", None) or len(getattr(model, "estimators_", [])) or None
+        t = time.perf_counter()
+        model.predict(X[:MAX_HORIZON])
+        stats = {
+            "fit_s": round(fit_s, 3),
+            "units": units,
+            "size_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+            "predict_ms": round((time.perf_counter() - t) * 1000, 3),
         }
-        yhat = float(model.predict(pd.DataFrame([row]))[0])
-        preds.append({"ts": next_ts, "yhat": yhat})
+        return model, stats
+
+
+BACKENDS = {
+    "rf": Backend(
+        "rf",
+        lambda: RandomForestRegressor(n_estimators=25, warm_start=True, n_jobs=FORECAST_N_JOBS, random_state=42),
+        grow="n_estimators", size=RF_TREES, step=25,
+    ),
+    "hgb": Backend(
+        "hgb",
+        lambda: HistGradientBoostingRegressor(max_iter=50, warm_start=True, random_state=42),
+        grow="max_iter", size=HGB_MAX_ITER, step=50,
+    ),
+    "ridge": Backend("ridge", lambda: make_pipeline(StandardScaler(), Ridge(alpha=1.0))),
+}
+if FORECAST_BACKEND not in BACKENDS:
+    raise ValueError(f"FORECAST_BACKEND must be one of {' | '.join(BACKENDS)}, not {FORECAST_BACKEND!r}")
+
+def model_set(backend: str = FORECAST_BACKEND) -> str:
+    """Backend + feature set, e.g. rf200-lag2-roll6-weather3-v2: models with the same key are interchangeable."""
+    return f"{BACKENDS[backend].key}-{FEATURE_SET}"
+
+def feature_table(df_joined: pd.DataFrame) -> pd.DataFrame:
+    """
+    make_features on a regular hourly grid: ts plus TABLE_COLS, one row per
+    hour (missing hours are NaN rows, so row i + h is always ts + h hours).
+    Computed once, then sliced by training cutoff (see train_model(end=)).
+    """
+    s = df_joined.assign(ts=pd.to_datetime(df_joined["ts"], utc=True)).sort_values("ts").drop_duplicates("ts")
+    if s.empty:
+        return pd.DataFrame(columns=["ts", *TABLE_COLS])
+    grid = pd.date_range(s["ts"].iloc[0], s["ts"].iloc[-1], freq="h", name="ts")
+    s = s.set_index("ts")[["value", *WEATHER_COLS]].reindex(grid).reset_index()
+    return make_features(s)[["ts", *TABLE_COLS]].reset_index(drop=True)
+
+def direct_rows(table: pd.DataFrame, lo: int, hi: int, max_rows: int = DIRECT_MAX_ROWS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Training matrix of the direct model for horizons lo..hi: one row per
+    (origin, h) with the load known at the origin and the calendar and
+    weather of origin + h; y is the load at origin + h. Rows with gaps are
+    skipped, origins are subsampled to max_rows.
+    """
+    col = {c: table[c].to_numpy(dtype=np.float32) for c in TABLE_COLS}
+    n = len(table)
+    per_h = max(1, max_rows // (hi - lo + 1))
 
-        # append predicted value to roll forward
-        last = pd.concat([last, pd.DataFrame([{"ts": next_ts, "value": yhat, **w}])], ignore_index=True)
+    Xs, ys = [], []
+    for h in range(lo, min(hi, n - 1) + 1):
+        i = np.arange(n - h)
+        j = i + h
+        X = np.column_stack([
+            np.full(len(i), h, dtype=np.float32), col["hour"][j], col["dow"][j],
+            # at the origin: lag_1 = value, lag_2 = previous value, roll_6 = mean of the last 6 values
+            col["value"][i], col["lag_1"][i], col["roll_6"][i],
+            *(col[c][j] for c in WEATHER_COLS),
+        ])
+        y = col["value"][j]
+        keep = np.flatnonzero(~np.isnan(X).any(axis=1) & ~np.isnan(y))
+        if len(keep) > per_h:
+            keep = np.sort(np.random.default_rng(h).choice(keep, per_h, replace=False))
+        Xs.append(X[keep])
+        ys.append(y[keep])
+    if not Xs:
+        return np.empty((0, len(DIRECT_FEATURE_COLS)), dtype=np.float32), np.empty(0, dtype=np.float32)
+    return np.concatenate(Xs), np.concatenate(ys)
 
-    return pd.DataFrame(preds)
+def train_model(table: pd.DataFrame, backend: str = FORECAST_BACKEND, budget_s: float = FIT_SECONDS, end=None) -> dict:
+    """
+    table: feature_table() of the history (e.g. features.read_features); only
+    hours before `end` are used. Models are fitted on float32 matrices.
+    Returns a bundle with the recursive (one step) model, one direct model
+    per horizon bucket (None if the history is too short for it), the tail
+    needed to forecast from them and the cost of each model ("stats").
+    CPU heavy: callers run it in the worker processes (workers.cpu_pool).
+    """
+    b = BACKENDS[backend]
+    if end is not None:
+        # ts is sorted: a positional slice is a view, a boolean mask would copy every column
+        table = table.iloc[: table["ts"].searchsorted(pd.Timestamp(end), side="left")]
+    df = table.dropna(subset=TABLE_COLS)
+    if df.empty:
+        raise ValueError("No complete feature rows to train on.")
+
+    model, model_stats = b.fit(df[FEATURE_COLS].to_numpy(dtype=np.float32), df["value"].to_numpy(dtype=np.float32), budget_s)
+
+    direct, direct_stats = [], []
+    for lo, hi in HORIZON_BUCKETS:
+        X, y = direct_rows(table, lo, hi)
+        if len(y) < TAIL_ROWS:
+            direct.append(None)
+            direct_stats.append(None)
+            continue
+        m, st = b.fit(X, y, budget_s)
+        direct.append(m)
+        direct_stats.append({"horizons": f"{lo}-{hi}", "rows": len(y), **st})
+
+    tail = table.dropna(subset=["value", *WEATHER_COLS])[["ts", "value", *WEATHER_COLS]].tail(TAIL_ROWS).reset_index(drop=True)
+    return {
+        "model": model,
+        "direct": direct,
+        "backend": backend,
+        "feature_set": model_set(backend),
+        "rows": len(df),
+        "tail": tail,
+        "stats": {"recursive": {"rows": len(df), **model_stats}, "direct": direct_stats},
+    }
+
+def future_weather(tail: pd.DataFrame, weather: pd.DataFrame | None, future_ts: pd.DatetimeIndex) -> np.ndarray:
+    """
+    (horizon, 3) weather matrix for the forecast hours: stored Open-Meteo
+    forecasts (nearest hour within 2h), carried forward past their end; the
+    last observed row where nothing is stored.
+    """
+    last = tail[WEATHER_COLS].iloc[-1].astype(float)
+    if weather is None or weather.empty:
+        return np.tile(last.to_numpy(), (len(future_ts), 1))
+    w = pd.merge_asof(
+        pd.DataFrame({"ts": future_ts.astype("datetime64[ns, UTC]")}),
+        weather.assign(ts=pd.to_datetime(weather["ts"], utc=True).astype("datetime64[ns, UTC]")).sort_values("ts")[["ts", *WEATHER_COLS]],
+        on="ts",
+        direction="nearest",
+        tolerance=pd.Timedelta("2h"),
+    )
+    return w[WEATHER_COLS].ffill().fillna(last).to_numpy(dtype=float)
+
+def _recursive(model, values: np.ndarray, hours: np.ndarray, dows: np.ndarray, W: np.ndarray) -> np.ndarray:
+    # one forest call per step, each prediction feeds the lags of the next
+    n, horizon = len(values), len(hours)
+    v = np.empty(n + horizon)
+    v[:n] = values
+    x = np.empty((1, len(FEATURE_COLS)))
+    for i in range(horizon):
+        k = n + i
+        x[0, 0] = hours[i]
+        x[0, 1] = dows[i]
+        x[0, 2] = v[k - 1]
+        x[0, 3] = v[k - 2] if k > 1 else v[k - 1]
+        x[0, 4] = v[max(0, k - 6):k].mean()
+        x[0, 5:] = W[i]
+        v[k] = model.predict(x)[0]
+    return v[n:]
+
+def _direct(models: list, values: np.ndarray, hours: np.ndarray, dows: np.ndarray, W: np.ndarray) -> np.ndarray:
+    # whole feature matrix at once, one call per horizon bucket
+    horizon = len(hours)
+    h = np.arange(1, horizon + 1, dtype=float)
+    origin = [values[-1], values[-2] if len(values) > 1 else values[-1], values[-6:].mean()]
+    X = np.column_stack([h, hours, dows, np.tile(origin, (horizon, 1)), W])
+    yhat = np.empty(horizon)
+    for (lo, hi), model in zip(HORIZON_BUCKETS, models):
+        rows = (h >= lo) & (h <= hi)
+        if rows.any():
+            yhat[rows] = model.predict(X[rows])
+    return yhat
+
+def uses_direct(bundle: dict, horizon: int, mode: str = "direct") -> bool:
+    """Whether forecast_from_model runs the direct models (every bucket up to `horizon` trained)."""
+    needed = [m for (lo, _), m in zip(HORIZON_BUCKETS, bundle.get("direct", [])) if lo <= horizon]
+    return mode == "direct" and bool(needed) and all(m is not None for m in needed)
+
+def forecast_from_model(bundle: dict, horizon: int = 24, weather: pd.DataFrame | None = None, mode: str = "direct") -> pd.DataFrame:
+    """
+    Forecast the `horizon` hours after the end of the model's training data.
+    weather: stored weather (forecasts) covering those hours, if any.
+    mode="direct" uses the horizon bucket models (falls back to recursive when
+    a needed bucket has no model), mode="recursive" rolls the one-step model.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown forecast mode {mode!r} ({' | '.join(MODES)}).")
+    if horizon > MAX_HORIZON:
+        raise ValueError(f"horizon must be <= {MAX_HORIZON}")
+    tail = bundle["tail"]
+    values = tail["value"].to_numpy(dtype=float)
+    future_ts = pd.DatetimeIndex(tail["ts"].iloc[-1] + pd.to_timedelta(np.arange(1, horizon + 1), unit="h"))
+    hours = future_ts.hour.to_numpy(dtype=float)
+    dows = future_ts.dayofweek.to_numpy(dtype=float)
+    W = future_weather(tail, weather, future_ts)
+
+    if uses_direct(bundle, horizon, mode):
+        yhat = _direct(bundle["direct"], values, hours, dows, W)
+    else:
+        yhat = _recursive(bundle["model"], values, hours, dows, W)
+    return pd.DataFrame({"ts": future_ts, "yhat": yhat})
+
+def train_and_forecast(
+    df_joined: pd.DataFrame, horizon: int = 24, weather: pd.DataFrame | None = None, mode: str = "direct", backend: str = FORECAST_BACKEND,
+) -> pd.DataFrame:
+    """
+    df_joined columns: ts, value (load), temperature_2m, windspeed_10m, precipitation
+    """
+    return forecast_from_model(train_model(feature_table(df_joined), backend), horizon=horizon, weather=weather, mode=mode)
@@ -1,36 +1,33 @@
 import os
+import logging
+from datetime import datetime
+import numpy as np
 import pandas as pd
 from dateutil import tz
 from sqlalchemy.orm import Session
 
-from .models import TimeSeriesPoint, WeatherPoint
-from .smard_client import fetch_index, fetch_series
-from .weather_client import fetch_openmeteo_hourly
+from .aggregates import refresh_aggregates
+from .bulk import upsert_frame
+from .coldstore import export_cold_months, refresh_cold_months
+from .models import TimeSeriesPoint, WeatherPoint, WeatherStationPoint, IngestWatermark
+from .partitions import archive_old_partitions, ensure_partitions
+from .pipeline import run_pipeline
+from .rollup import BASE_RESOLUTION, DERIVED, rollup_series
+from .series import ensure_series, get_series_id, series_key
+from .cache import response_cache
+from .events import RESOLUTION_STEP, evaluate_series
+from .features import update_features
+from .versions import WEATHER, bump_versions, series_version_name
+from .smard_client import SMARD_MAX_CONCURRENCY, fetch_index, fetch_series_conditional, map_concurrent
+from .weather_client import HOURLY_VARS, Station, fetch_openmeteo_hourly_multi, load_stations
 
-BERLIN = tz.gettz("Europe/Berlin")
+log = logging.getLogger("energy_api.ingest")
 
-def _upsert_timeseries(db: Session, region: str, metric: str, resolution: str, df: pd.DataFrame):
-    # simple approach: delete overlap + insert (fine for course project)
-    if df.empty:
-        return
-    start, end = df["ts"].min(), df["ts"].max()
-    db.query(TimeSeriesPoint).filter(
-        TimeSeriesPoint.region == region,
-        TimeSeriesPoint.metric == metric,
-        TimeSeriesPoint.resolution == resolution,
-        TimeSeriesPoint.ts >= start,
-        TimeSeriesPoint.ts <= end,
-    ).delete(synchronize_session=False)
-
-    db.bulk_save_objects([
-        TimeSeriesPoint(region=region, metric=metric, resolution=resolution, ts=row.ts, value=float(row.value))
-        for row in df.itertuples(index=False)
-    ])
-    db.commit()
+BERLIN = tz.gettz("Europe/Berlin")
 
-def ingest_smard_metric(db: Session, region: str, metric: str, filter_id: str, resolution: str):
-    idx = fetch_index(filter_id=filter_id, region=region, resolution=resolution)
+TIMESERIES_KEY = ["series_id", "ts"]
 
+def _chunk_timestamps(idx) -> list:
     # Extract timestamps robustly
     timestamps = []
     if isinstance(idx, dict):
@@ -40,62 +37,174 @@ def ingest_smard_metric(db: Session, region: str, metric: str, filter_id: str, r
                 break
     elif isinstance(idx, list):
         timestamps = idx
+    return timestamps
 
-    if not timestamps:
-        return
+def _chunk_frame(series: dict) -> pd.DataFrame:
+    points = series.get("series") or series.get("data") or series.get("values")
+    if not points:
+        return pd.DataFrame(columns=["ts", "value"])
 
-    # ✅ Fix C: fetch last N chunks (history)
-    N = 60
-    for ts_chunk in timestamps[-N:]:
-        ts_chunk = int(ts_chunk)
+    df = pd.DataFrame(points, columns=["ts_ms", "value"])
+    df["ts"] = pd.to_datetime(df["ts_ms"], unit="ms", utc=True)  # store as UTC
+    return df[["ts", "value"]].dropna()
 
-        series = fetch_series(filter_id=filter_id, region=region, resolution=resolution, timestamp=ts_chunk)
+# ✅ Fix C: fetch last N chunks (history)
+HISTORY_CHUNKS = 60
 
-        points = series.get("series") or series.get("data") or series.get("values")
-        if not points:
-            continue
+# SMARD only appends to the newest chunk(s); these are re-checked every cycle
+OPEN_CHUNKS = int(os.getenv("SMARD_OPEN_CHUNKS", "2"))
+
+def _plan_chunks(db: Session, filter_id: str, region: str, resolution: str, timestamps: list) -> list:
+    """
+    Returns [(chunk_ts, watermark-or-None)] for the chunks worth requesting:
+    never-ingested chunks plus the still-open newest ones. Closed chunks with
+    a watermark are skipped entirely.
+    """
+    window = [int(t) for t in timestamps[-HISTORY_CHUNKS:]]
+    marks = {
+        wm.chunk_ts: wm
+        for wm in db.query(IngestWatermark).filter(
+            IngestWatermark.filter_id == filter_id,
+            IngestWatermark.region == region,
+            IngestWatermark.resolution == resolution,
+        )
+    }
+    open_chunks = set(window[-OPEN_CHUNKS:]) if OPEN_CHUNKS > 0 else set()
+    return [(ts, marks.get(ts)) for ts in window if ts not in marks or ts in open_chunks]
 
-        df = pd.DataFrame(points, columns=["ts_ms", "value"])
-        df["ts"] = pd.to_datetime(df["ts_ms"], unit="ms", utc=True)  # store as UTC
-        df = df[["ts", "value"]].dropna()
+# pipeline sizing: chunks coalesced per bulk write, and queue depth between stages
+WRITE_BATCH_CHUNKS = int(os.getenv("INGEST_WRITE_BATCH_CHUNKS", "16"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "32"))
 
-        _upsert_timeseries(db, region=region, metric=metric, resolution=resolution, df=df)
+# a chunk job is ((region, resolution, metric, filter_id, series_id), chunk_ts, watermark-or-None)
 
+def _fetch_chunk(job):
+    (region, resolution, _, filter_id, _), ts_chunk, wm = job
+    return fetch_series_conditional(
+        filter_id=filter_id,
+        region=region,
+        resolution=resolution,
+        timestamp=ts_chunk,
+        etag=wm.etag if wm is not None else None,
+        last_modified=wm.last_modified if wm is not None else None,
+    )
 
-def ingest_weather(db: Session, lat: float, lon: float, timezone: str = "Europe/Berlin"):
-    payload = fetch_openmeteo_hourly(lat, lon, timezone=timezone)
+def _parse_chunk(job, resp):
+    """Parser stage: JSON -> columnar frame, or None if the chunk is unchanged."""
+    _, _, wm = job
+    if resp.not_modified or (wm is not None and resp.content_hash == wm.content_hash):
+        return None
+
+    (_, _, _, _, series_id), _, _ = job
+    df = _chunk_frame(resp.data)
+    df = df.assign(series_id=series_id, value=df["value"].astype(float))
+    return job, resp, df[["series_id", "ts", "value"]]
+
+def _write_chunks(db: Session, batch: list, touched: dict) -> int:
+    """
+    Writer stage: update watermarks and upsert several chunks in one bulk write.
+    touched collects the written ts range per series_id.
+    """
+    now = datetime.now(tz.UTC)
+    for job, resp, _ in batch:
+        (region, resolution, _, filter_id, _), ts_chunk, wm = job
+        if wm is None:
+            wm = IngestWatermark(filter_id=filter_id, region=region, resolution=resolution, chunk_ts=ts_chunk)
+            db.add(wm)
+        wm.etag = resp.etag
+        wm.last_modified = resp.last_modified
+        wm.content_hash = resp.content_hash
+        wm.ingested_at = now
+
+    frames = [df for _, _, df in batch if not df.empty]
+    if not frames:
+        return 0
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(TIMESERIES_KEY, keep="last")
+    for sid, g in df.groupby("series_id"):
+        lo, hi = g["ts"].min(), g["ts"].max()
+        if sid in touched:
+            lo, hi = min(lo, touched[sid][0]), max(hi, touched[sid][1])
+        touched[sid] = (lo, hi)
+    ensure_partitions(db, df["ts"].min(), df["ts"].max())
+    return upsert_frame(db, TimeSeriesPoint.__table__, df, key_cols=TIMESERIES_KEY)
+
+def _ingest_chunks(db: Session, jobs: list) -> dict:
+    """Runs the chunk pipeline; returns {series_id: (min_ts, max_ts)} written."""
+    touched = {}
+    # network, parsing and DB writes overlap; the writer stays on this thread (one session)
+    stats = run_pipeline(
+        jobs,
+        fetch=_fetch_chunk,
+        parse=_parse_chunk,
+        write=lambda batch: _write_chunks(db, batch, touched),
+        fetch_workers=SMARD_MAX_CONCURRENCY,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        batch_size=WRITE_BATCH_CHUNKS,
+    )
+    log.info(
+        "SMARD: %d chunks requested, %d changed, %d rows written",
+        len(jobs), stats["write"].items, stats["write"].rows,
+    )
+    return touched
+
+def _station_frame(station: Station, payload: dict) -> pd.DataFrame:
     hourly = payload.get("hourly", {})
     times = hourly.get("time", [])
+    df = pd.DataFrame({"ts": pd.to_datetime(times)})
+    for var in HOURLY_VARS:
+        df[var] = pd.to_numeric(pd.Series(hourly.get(var, [None] * len(times))), errors="coerce")
+    df["ts"] = df["ts"].dt.tz_localize("UTC")  # requested in GMT -> no DST ambiguity
+    df["station"] = station.name
+    return df
 
-    if not times:
-        return
-
-    df = pd.DataFrame({
-        "ts": pd.to_datetime(times),
-        "temperature_2m": hourly.get("temperature_2m", []),
-        "windspeed_10m": hourly.get("windspeed_10m", []),
-        "precipitation": hourly.get("precipitation", []),
-    })
-    df["ts"] = df["ts"].dt.tz_localize(timezone)
-
-    # delete overlap then insert
-    start, end = df["ts"].min(), df["ts"].max()
-    db.query(WeatherPoint).filter(WeatherPoint.ts >= start, WeatherPoint.ts <= end).delete(synchronize_session=False)
-
-    db.bulk_save_objects([
-        WeatherPoint(
-            ts=row.ts,
-            temperature_2m=None if pd.isna(row.temperature_2m) else float(row.temperature_2m),
-            windspeed_10m=None if pd.isna(row.windspeed_10m) else float(row.windspeed_10m),
-            precipitation=None if pd.isna(row.precipitation) else float(row.precipitation),
-        )
-        for row in df.itertuples(index=False)
-    ])
-    db.commit()
+def _weighted_weather(df: pd.DataFrame, stations: list[Station]) -> pd.DataFrame:
+    """
+    Weighted national series: per ts and variable, sum(w*x) / sum(w) over the
+    stations that have a value. Computed on a (ts x station) matrix per variable.
+    """
+    wide = df.pivot(index="ts", columns="station", values=HOURLY_VARS)
+    weights = pd.Series({s.name: s.weight for s in stations}, dtype=float)
+    out = pd.DataFrame({"ts": wide.index})
+    for var in HOURLY_VARS:
+        x = wide[var].to_numpy(dtype=float)
+        w = weights.reindex(wide[var].columns).fillna(0.0).to_numpy()
+        wsum = (~np.isnan(x) * w).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[var] = np.where(wsum > 0, np.nansum(x * w, axis=1) / wsum, np.nan)
+    return out
+
+def ingest_weather(db: Session, stations: list[Station] | None = None) -> tuple | None:
+    """
+    Fetches all stations in one batched Open-Meteo request, stores them per
+    station and writes the weighted aggregate into weather_hourly.
+    Returns the (first, last) ts written to weather_hourly, or None.
+    """
+    stations = stations or load_stations()
+    if not stations:
+        return None
+
+    payloads = fetch_openmeteo_hourly_multi(stations)
+    frames = [_station_frame(st, p) for st, p in zip(stations, payloads)]
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(["station", "ts"])
+    if df.empty:
+        return None
+
+    upsert_frame(
+        db,
+        WeatherStationPoint.__table__,
+        df[["station", "ts", *HOURLY_VARS]],
+        key_cols=["station", "ts"],
+    )
+    weighted = _weighted_weather(df, stations)
+    if not upsert_frame(db, WeatherPoint.__table__, weighted, key_cols=["ts"]):
+        return None
+    return weighted["ts"].min(), weighted["ts"].max()
 
 def run_ingestion(db: Session):
     regions = ["DE", "DE-LU"]   # keep only DE if you want
-    resolutions = ["quarterhour", "hour", "day"]
+    # only quarterhour is fetched by default; hour/day are rolled up locally
+    resolutions = os.getenv("SMARD_RESOLUTIONS", "quarterhour").split(",")
+    derived = [r for r in DERIVED if r not in resolutions]
 
     metric_filters = {
         "load": os.getenv("SMARD_FILTER_LOAD", ""),
@@ -103,21 +212,83 @@ def run_ingestion(db: Session):
         "solar": os.getenv("SMARD_FILTER_SOLAR", ""),
     }
 
-    for region in regions:  # ✅ loop one-by-one
-        for resolution in resolutions:
+    # every (region, resolution, metric) series of this cycle; catalog ids are
+    # resolved (and created) before anything is written
+    specs = [
+        (region, resolution, metric, fid, ensure_series(db, region, metric, resolution, filter_id=fid))
+        for region in regions
+        for resolution in resolutions
+        for metric, fid in metric_filters.items()
+        if fid
+    ]
+    for region in regions:
+        for resolution in derived:
             for metric, fid in metric_filters.items():
                 if fid:
-                    ingest_smard_metric(
-                        db,
-                        region=region,      # ✅ string, not list
-                        metric=metric,
-                        filter_id=fid,
-                        resolution=resolution,
-                    )
-
-    # weather ingestion once (Berlin coords)
-    lat = float(os.getenv("OPENMETEO_LAT", "52.52"))
-    lon = float(os.getenv("OPENMETEO_LON", "13.405"))
-    ingest_weather(db, lat=lat, lon=lon, timezone=os.getenv("TZ", "Europe/Berlin"))
+                    ensure_series(db, region, metric, resolution, filter_id=fid)
+
+    # 1) all indexes concurrently, then plan only new / still-open chunks
+    jobs = []
+    for spec, idx in map_concurrent(lambda sp: fetch_index(filter_id=sp[3], region=sp[0], resolution=sp[1]), specs):
+        if idx is None:
+            log.warning("SMARD index fetch failed for %s", spec)
+            continue
+        region, resolution, _, fid, _ = spec
+        plan = _plan_chunks(db, fid, region, resolution, _chunk_timestamps(idx))
+        jobs.extend((spec, ts_chunk, wm) for ts_chunk, wm in plan)
+
+    # 2) all planned chunks of all series through one fetch -> parse -> write pipeline
+    touched = _ingest_chunks(db, jobs)
+
+    # 3) refresh derived hour/day buckets that the new quarter-hours fall into,
+    #    then the day/week/month aggregates of every series that changed
+    #    and the alert events of the new points
+    changed = set()
+    events = 0
+    load_windows = {}   # hourly load series -> window rewritten, for the forecast features
+    rewritten = dict(touched)   # every series -> window rewritten, for the Parquet tier
+    for sid, (lo, hi) in touched.items():
+        region, metric, resolution = series_key(db, sid)
+        refresh_aggregates(db, sid, lo, hi)
+        events += evaluate_series(db, sid, resolution, lo, hi)
+        changed.add(series_version_name(sid))
+        if metric == "load" and resolution == "hour":
+            load_windows[sid] = (lo, hi)
+        if derived and resolution == BASE_RESOLUTION:
+            rollup_series(db, region, metric, lo, hi, resolutions=derived)
+            for res in derived:
+                derived_id = get_series_id(db, region, metric, res)
+                refresh_aggregates(db, derived_id, lo, hi)
+                # the bucket holding lo starts up to one step earlier
+                events += evaluate_series(db, derived_id, res, lo - RESOLUTION_STEP[res], hi)
+                changed.add(series_version_name(derived_id))
+                rewritten[derived_id] = (lo - RESOLUTION_STEP[res], hi)
+                if metric == "load" and res == "hour":
+                    load_windows[derived_id] = (lo - RESOLUTION_STEP[res], hi)
+    if events:
+        log.info("alert rules: %d events (re)written", events)
+
+    # weather: all stations in one request
+    weather_window = ingest_weather(db)
+    if weather_window:
+        changed.add(WEATHER)
+
+    # forecast inputs: only the hours whose load or weather was rewritten
+    written = update_features(db, load_windows, weather_window)
+    if written:
+        log.info("forecast features: %d rows (re)written", written)
+
+    # one transaction for the whole run; the version bump commits with the data
+    bump_versions(db, changed)
+    db.commit()
+    response_cache.invalidate(changed)
+
+    # closed months -> Parquet tier (if COLD_STORE_DIR is set): exported months
+    # that just got rows again are rewritten first. Then detach months beyond
+    # TIMESERIES_RETENTION_MONTHS
+    refresh_cold_months(db, rewritten)
+    export_cold_months(db)
+    archive_old_partitions(db)
+    db.commit()
 
 
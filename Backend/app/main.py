@@ -3,136 +3,562 @@ logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("energy_api")
 
 import os
+import numpy as np
 import pandas as pd
-from fastapi import FastAPI, Depends, Query, HTTPException
+from fastapi import FastAPI, Depends, Query, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from .db import Base, engine, get_db, SessionLocal
-from .models import TimeSeriesPoint, WeatherPoint
-from .schemas import TSPoint, ForecastPoint
+from .db import Base, engine, async_engine, get_async_db, get_db, AsyncSessionLocal, SessionLocal
+from .models import AlertEvent, AlertRule, BacktestResult, BacktestRun, Series, SeriesAggregate
+from .schemas import (
+    TSPoint, ForecastPoint, AggregatePoint, WindowStats, AlertRuleIn, AlertRuleOut, AlertEventOut, ModelInfo, BacktestRunOut,
+)
 from .ingest import run_ingestion
-from .forecast import train_and_forecast
+from .series import aget_series_id, get_series_id, load_catalog
+from .store import (
+    AGGS, DERIVED_METRICS, to_utc, aread_aligned, aread_bucketed, aread_series, aread_weather, astream_series,
+    read_series_empty,
+)
+from .encoders import EXPORT_FORMATS, export_stream, frame_response, negotiate, pa
+from .cache import is_fresh, make_etag, not_modified, response_cache, with_validators
+from .versions import acurrent_versions, series_version_name
+from .downsample import downsample
+from .forecast import MAX_HORIZON, MODES, forecast_from_model
+from .aggregates import summarize
+from .stats import QUANTILES, window_stats
+from .events import RESOLUTION_GAP, RESOLUTION_STEP, backfill_rule, find_runs
+from .migrations import migrate
+from . import registry, workers
 
 app = FastAPI(title="Energy Dashboard API", version="1.0")
 
+migrate(engine)
 Base.metadata.create_all(bind=engine)
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+# Read endpoints are async on the asyncpg pool (db.async_engine); pandas work
+# runs in the threadpool and model training in the worker processes.
 @app.get("/timeseries", response_model=list[TSPoint])
-def timeseries(
+async def timeseries(
+    request: Request,
     region: str = Query("DE"),
     metric: str = Query(..., description="load | wind | solar"),
     resolution: str = Query("hour"),
     start: str = Query(...),
     end: str = Query(...),
-    db: Session = Depends(get_db),
+    shape: str = Query("records", pattern="^(records|columnar)$", description='records | columnar ({"ts": [...], "value": [...]})'),
+    max_points: int | None = Query(None, ge=4, description="downsample to at most this many points"),
+    downsample_method: str = Query("minmax", alias="downsample", pattern="^(minmax|lttb)$"),
+    bucket: str | None = Query(None, description="aggregate into fixed buckets, e.g. 15min, 6h, 1d (UTC-aligned)"),
+    agg: str = Query("mean", pattern=f"^({'|'.join(AGGS)})$", description="aggregate per bucket"),
+    fmt: str | None = Query(None, alias="format", description="json | arrow | parquet (default: Accept header, else json)"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     start_dt = pd.to_datetime(start)
     end_dt = pd.to_datetime(end)
+    kind = negotiate(request, fmt)
+    stride = _parse_bucket(bucket) if bucket else None
 
-    rows = (
-        db.query(TimeSeriesPoint)
-        .filter(TimeSeriesPoint.region == region)
-        .filter(TimeSeriesPoint.metric == metric)
-        .filter(TimeSeriesPoint.resolution == resolution)
-        .filter(TimeSeriesPoint.ts >= start_dt)
-        .filter(TimeSeriesPoint.ts <= end_dt)
-        .order_by(TimeSeriesPoint.ts.asc())
-        .all()
+    series_id = await aget_series_id(db, region, metric, resolution)
+    if series_id is None:
+        return frame_response(request, read_series_empty(), fmt=kind, shape=shape)
+
+    # the data only changes when ingestion bumps the series version
+    deps = [series_version_name(series_id)]
+    versions, last_modified = await acurrent_versions(db, deps)
+    params = (
+        series_id, start_dt, end_dt, max_points, downsample_method if max_points else None,
+        stride, agg if stride is not None else None,
     )
-    return [{"ts": r.ts, "value": r.value} for r in rows]
+    etag = make_etag("timeseries", params, shape, kind, versions)
+    if is_fresh(request, etag, last_modified):
+        return not_modified(etag, last_modified)
 
-@app.get("/forecast", response_model=list[ForecastPoint])
-def forecast(
+    async def load():
+        # (ts, value) tuples only -> columns -> streamed orjson; no ORM objects, no per-row pydantic
+        if stride is not None:
+            df = await aread_bucketed(db, series_id, start_dt, end_dt, stride, agg)
+        else:
+            df = await aread_series(db, series_id, start_dt, end_dt)
+        if max_points:
+            # min/max per bucket keeps every peak; lttb keeps the visual shape
+            df = await run_in_threadpool(downsample, df, max_points, method=downsample_method)
+        return df
+
+    df = await response_cache.aget_or_compute(("timeseries", params, versions), deps, load)
+    resp = await run_in_threadpool(frame_response, request, df, fmt=kind, shape=shape)
+    return with_validators(resp, etag, last_modified)
+
+def _parse_bucket(bucket: str) -> pd.Timedelta:
+    try:
+        # "1d" is deprecated in pandas in favour of "1D"
+        stride = pd.Timedelta(bucket[:-1] + "D" if bucket.endswith("d") else bucket)
+    except ValueError:
+        stride = None
+    if stride is None or pd.isna(stride) or stride < pd.Timedelta(minutes=1):
+        raise HTTPException(status_code=400, detail=f"Invalid bucket {bucket!r}: use a fixed interval of at least 1min, e.g. 6h.")
+    return stride
+
+@app.get("/timeseries/batch")
+async def timeseries_batch(
+    request: Request,
+    region: str = Query("DE"),
+    metrics: list[str] = Query(
+        ["load", "wind", "solar"],
+        description="load | wind | solar | renewables | conventional | renew_share (repeat or comma-separate)",
+    ),
+    resolution: str = Query("hour"),
+    start: str = Query(...),
+    end: str = Query(...),
+    shape: str = Query("records", pattern="^(records|columnar)$"),
+    fmt: str | None = Query(None, alias="format", description="json | arrow | parquet (default: Accept header, else json)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Several metrics aligned on ts in one response, e.g.
+    [{"ts": ..., "load": ..., "wind": ..., "renew_share": ...}, ...].
+    Stored metrics come from a single pivot query; derived ones are computed
+    on the aligned columns.
+    """
+    metrics = list(dict.fromkeys(m.strip() for item in metrics for m in item.split(",") if m.strip()))
+
+    stored = []
+    for m in metrics:
+        for dep in DERIVED_METRICS[m][0] if m in DERIVED_METRICS else (m,):
+            if dep not in stored:
+                stored.append(dep)
+
+    kind = negotiate(request, fmt)
+    ids = {m: sid for m in stored if (sid := await aget_series_id(db, region, m, resolution)) is not None}
+    deps = [series_version_name(sid) for sid in ids.values()]
+    versions, last_modified = await acurrent_versions(db, deps)
+    params = (tuple(ids.items()), tuple(metrics), pd.to_datetime(start), pd.to_datetime(end))
+    etag = make_etag("timeseries/batch", params, shape, kind, versions)
+    if is_fresh(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    async def load():
+        df = await aread_aligned(db, ids, start, end)
+        for m in stored:
+            if m not in df:
+                df[m] = np.nan
+        for m in metrics:
+            if m in DERIVED_METRICS:
+                df[m] = DERIVED_METRICS[m][1](df)
+        return df
+
+    df = await response_cache.aget_or_compute(("timeseries/batch", params, versions), deps, load)
+    resp = await run_in_threadpool(frame_response, request, df, fmt=kind, shape=shape, value_cols=metrics)
+    return with_validators(resp, etag, last_modified)
+
+# rows fetched per server-side cursor round trip (and per Parquet row group) on /export
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "50000"))
+
+@app.get("/export")
+async def export(
+    region: str = Query("DE"),
+    metrics: list[str] = Query(["load", "wind", "solar"], description="load | wind | solar (repeat or comma-separate)"),
+    resolution: str = Query("hour"),
+    start: str = Query(...),
+    end: str = Query(...),
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Stream any range of one or more series as long rows (metric, ts, value),
+    ordered by metric then ts. Rows come from a server-side cursor (and the
+    Parquet tier month by month), so memory stays flat however large the range.
+    """
+    metrics = list(dict.fromkeys(m.strip() for item in metrics for m in item.split(",") if m.strip()))
+    ids = {m: sid for m in metrics if (sid := await aget_series_id(db, region, m, resolution)) is not None}
+    if not ids:
+        raise HTTPException(status_code=404, detail=f"No {resolution} series for {metrics} in region {region}.")
+    if fmt == "parquet" and pa is None:
+        raise HTTPException(status_code=406, detail="pyarrow is not installed on the API server.")
+    start_dt, end_dt = to_utc(start), to_utc(end)
+
+    async def batches():
+        # own session: the response outlives the request-scoped one
+        async with AsyncSessionLocal() as stream_db:
+            for name, sid in ids.items():
+                async for df in astream_series(stream_db, sid, start_dt, end_dt, batch_rows=EXPORT_BATCH_ROWS):
+                    yield name, df
+
+    filename = f"{region}_{resolution}_{start_dt:%Y%m%d}_{end_dt:%Y%m%d}.{fmt}"
+    return StreamingResponse(
+        export_stream(batches(), fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/aggregate", response_model=list[AggregatePoint])
+async def aggregate(
     region: str = Query("DE"),
-    horizon: int = Query(24, ge=1, le=72),
-    db: Session = Depends(get_db),
+    metric: str = Query(..., description="load | wind | solar"),
+    resolution: str = Query("hour", description="series the aggregates are built from"),
+    period: str = Query("day", pattern="^(day|week|month)$"),
+    start: str = Query(...),
+    end: str = Query(...),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    # Weather range (min/max) determines the usable training window
-    w_range = pd.read_sql_query(
-        "SELECT MIN(ts) AS min_ts, MAX(ts) AS max_ts FROM weather_hourly",
-        db.bind,
-    ).iloc[0]
-    w_min = w_range["min_ts"]
-    w_max = w_range["max_ts"]
-
-    if pd.isna(w_min) or pd.isna(w_max):
-        raise HTTPException(status_code=400, detail="No weather data available yet in weather_hourly.")
-
-    # Load rows only within the weather window
-    df_load = pd.read_sql_query(
-        """
-        SELECT ts, value
-        FROM timeseries
-        WHERE region = %(region)s
-          AND metric = 'load'
-          AND resolution = 'hour'
-          AND ts >= %(w_min)s
-          AND ts <= %(w_max)s
-        ORDER BY ts ASC
-        """,
-        db.bind,
-        params={"region": region, "w_min": w_min, "w_max": w_max},
+    """Precomputed day/week/month summaries: O(buckets) instead of O(raw points)."""
+    series_id = await aget_series_id(db, region, metric, resolution)
+    if series_id is None:
+        return []
+
+    A = SeriesAggregate
+    rows = (await db.execute(
+        select(A.bucket, A.count, A.sum, A.min, A.max, A.sumsq)
+        .where(A.series_id == series_id, A.period == period)
+        .where(A.bucket >= to_utc(start).to_pydatetime(), A.bucket <= to_utc(end).to_pydatetime())
+        .order_by(A.bucket.asc())
+    )).all()
+    if not rows:
+        return []
+
+    df = summarize(pd.DataFrame(rows, columns=["bucket", "count", "sum", "min", "max", "sumsq"]))
+    df = df.astype(object).where(pd.notna(df), None)
+    return df[["bucket", "count", "sum", "mean", "min", "max", "std"]].to_dict("records")
+
+MAX_STATS_WINDOWS = 16
+
+@app.get("/stats", response_model=list[WindowStats])
+async def stats(
+    request: Request,
+    region: str = Query("DE"),
+    metric: str = Query(..., description="load | wind | solar"),
+    resolution: str = Query("hour"),
+    window: list[str] = Query(..., description="start/end (ISO 8601); repeat for several windows, e.g. period A and B"),
+    q: list[float] = Query(list(QUANTILES), description="quantiles to report"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """count, mean, std, min, max, quantiles and the last value per window, computed in the database."""
+    if len(window) > MAX_STATS_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATS_WINDOWS} windows per request.")
+    if any(not 0 <= x <= 1 for x in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be within [0, 1].")
+    try:
+        windows = [tuple(to_utc(part) for part in w.split("/", 1)) for w in window]
+    except ValueError:
+        windows = []
+    if not windows or any(len(w) != 2 or w[0] > w[1] for w in windows):
+        raise HTTPException(status_code=400, detail="Each window must be 'start/end' with start <= end.")
+
+    series_id = await aget_series_id(db, region, metric, resolution)
+    if series_id is None:
+        raise HTTPException(status_code=404, detail=f"No {resolution} {metric} series for region {region}.")
+
+    deps = [series_version_name(series_id)]
+    versions, last_modified = await acurrent_versions(db, deps)
+    params = (series_id, tuple(windows), tuple(q))
+    etag = make_etag("stats", params, versions)
+    if is_fresh(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    rows = await response_cache.aget_or_compute(
+        ("stats", params, versions), deps, lambda: window_stats(db, series_id, windows, tuple(q)),
     )
+    return with_validators(JSONResponse(jsonable_encoder(rows)), etag, last_modified)
+
+def _rule_out(rule: AlertRule, series: tuple, **extra) -> dict:
+    region, metric, resolution = series
+    return {
+        "id": rule.id, "region": region, "metric": metric, "resolution": resolution,
+        "op": rule.op, "threshold": rule.threshold, "name": rule.name, **extra,
+    }
+
+@app.post("/alert-rules", response_model=AlertRuleOut)
+def register_alert_rule(body: AlertRuleIn, db: Session = Depends(get_db)):
+    """
+    Get-or-create a threshold rule on a stored series. A new rule is evaluated
+    once over the whole history; after that every ingest only evaluates the
+    points it wrote.
+    """
+    series_id = get_series_id(db, body.region, body.metric, body.resolution)
+    if series_id is None:
+        raise HTTPException(status_code=404, detail=f"No {body.resolution} {body.metric} series for region {body.region}.")
+    key = (body.region, body.metric, body.resolution)
 
-    # Weather rows (SQL direct)
-    df_weather = pd.read_sql_query(
-        """
-        SELECT ts, temperature_2m, windspeed_10m, precipitation
-        FROM weather_hourly
-        WHERE ts >= %(w_min)s AND ts <= %(w_max)s
-        ORDER BY ts ASC
-        """,
-        db.bind,
-        params={"w_min": w_min, "w_max": w_max},
+    def existing():
+        return db.execute(
+            select(AlertRule).where(
+                AlertRule.series_id == series_id, AlertRule.op == body.op, AlertRule.threshold == body.threshold,
+            )
+        ).scalar_one_or_none()
+
+    rule = existing()
+    if rule is not None:
+        return _rule_out(rule, key)
+
+    rule = AlertRule(
+        series_id=series_id, op=body.op, threshold=body.threshold, name=body.name,
+        created_at=pd.Timestamp.now(tz="UTC").to_pydatetime(),
     )
+    db.add(rule)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()  # registered concurrently
+        return _rule_out(existing(), key)
+    written = backfill_rule(db, rule, body.resolution)
+    db.commit()
+    return _rule_out(rule, key, created=True, events_backfilled=written)
 
-    # Debug counts
-    log.info("forecast debug: df_load=%d, df_weather=%d, window=[%s..%s]", len(df_load), len(df_weather), w_min, w_max)
+@app.get("/alert-rules", response_model=list[AlertRuleOut])
+async def list_alert_rules(db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.execute(
+        select(AlertRule, Series.region, Series.metric, Series.resolution)
+        .join(Series, Series.id == AlertRule.series_id)
+        .order_by(AlertRule.id)
+    )).all()
+    return [_rule_out(rule, (region, metric, resolution)) for rule, region, metric, resolution in rows]
 
-    if len(df_load) < 24:
-        raise HTTPException(status_code=400, detail=f"Not enough hourly load in overlap window (have {len(df_load)}, need >= 24).")
-    if len(df_weather) < 24:
-        raise HTTPException(status_code=400, detail=f"Not enough hourly weather in overlap window (have {len(df_weather)}, need >= 24).")
+@app.delete("/alert-rules/{rule_id}")
+def delete_alert_rule(rule_id: int, db: Session = Depends(get_db)):
+    db.execute(AlertEvent.__table__.delete().where(AlertEvent.rule_id == rule_id))
+    deleted = db.execute(AlertRule.__table__.delete().where(AlertRule.id == rule_id)).rowcount
+    db.commit()
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"No alert rule {rule_id}.")
+    return {"status": "deleted", "id": rule_id}
 
-    # Join nearest hour (force same timezone dtype)
-    df_load["ts"] = pd.to_datetime(df_load["ts"], utc=True)
-    df_weather["ts"] = pd.to_datetime(df_weather["ts"], utc=True)
+@app.get("/events", response_model=list[AlertEventOut])
+async def events(
+    region: str = Query("DE"),
+    metric: str | None = Query(None),
+    resolution: str | None = Query(None),
+    rule_id: int | None = Query(None),
+    threshold: float | None = Query(None, description="ad-hoc threshold on metric/resolution instead of the stored rules"),
+    op: str = Query("above", pattern="^(above|below)$"),
+    start: str = Query(...),
+    end: str = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Exceedance intervals overlapping [start, end], newest first. Intervals of
+    registered rules are maintained at ingest time, so this is an index lookup
+    per rule. With threshold, the runs of one series are computed from its
+    points in the window instead (clipped to it) and nothing is stored.
+    duration_s covers the last point's own interval (end - start + one step).
+    """
+    if threshold is not None:
+        return await _adhoc_events(db, region, metric, resolution or "hour", op, threshold, start, end)
 
-    df_joined = pd.merge_asof(
-        df_load.sort_values("ts"),
-        df_weather.sort_values("ts"),
-        on="ts",
-        direction="nearest",
-        tolerance=pd.Timedelta("2h"),
-    ).dropna(subset=["temperature_2m", "windspeed_10m", "precipitation"])
+    E, R, S = AlertEvent, AlertRule, Series
+    q = (
+        select(E, R.name, R.op, R.threshold, S.metric, S.resolution)
+        .join(R, R.id == E.rule_id)
+        .join(S, S.id == R.series_id)
+        .where(S.region == region)
+        .where(E.start_ts <= to_utc(end).to_pydatetime(), E.end_ts >= to_utc(start).to_pydatetime())
+        .order_by(E.start_ts.desc())
+    )
+    if metric:
+        q = q.where(S.metric == metric)
+    if resolution:
+        q = q.where(S.resolution == resolution)
+    if rule_id is not None:
+        q = q.where(E.rule_id == rule_id)
 
-    log.info("forecast debug: df_joined=%d (after merge+dropna)", len(df_joined))
+    out = []
+    for ev, name, op, threshold, m, res in (await db.execute(q)).all():
+        start_ts, end_ts = to_utc(ev.start_ts), to_utc(ev.end_ts)
+        out.append({
+            "rule_id": ev.rule_id, "name": name, "metric": m, "op": op, "threshold": threshold,
+            "start": start_ts, "end": end_ts,
+            "duration_s": (end_ts - start_ts + RESOLUTION_STEP.get(res, pd.Timedelta(0))).total_seconds(),
+            "peak": ev.peak, "peak_ts": to_utc(ev.peak_ts) if ev.peak_ts is not None else None, "points": ev.points,
+        })
+    return out
 
-    if len(df_joined) < 24:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Not enough merged load+weather rows after join (have {len(df_joined)}, need >= 48).",
-        )
+async def _adhoc_events(db: AsyncSession, region: str, metric: str | None, resolution: str, op: str, threshold: float, start: str, end: str) -> list[dict]:
+    if not metric:
+        raise HTTPException(status_code=400, detail="An ad-hoc threshold needs a metric.")
+    series_id = await aget_series_id(db, region, metric, resolution)
+    if series_id is None:
+        raise HTTPException(status_code=404, detail=f"No {resolution} {metric} series for region {region}.")
 
-    df_pred = train_and_forecast(df_joined, horizon=horizon)
-    if df_pred is None or len(df_pred) == 0:
-        raise HTTPException(status_code=400, detail="Model produced empty forecast output.")
+    df = await aread_series(db, series_id, start, end)
+    gap = RESOLUTION_GAP.get(resolution, pd.Timedelta(hours=1))
+    runs = await run_in_threadpool(find_runs, df, op, threshold, gap)
+    step = RESOLUTION_STEP.get(resolution, pd.Timedelta(0))
+    out = []
+    for r in runs.iloc[::-1].itertuples(index=False):
+        start_ts, end_ts = to_utc(r.start_ts), to_utc(r.end_ts)
+        out.append({
+            "rule_id": None, "name": None, "metric": metric, "op": op, "threshold": threshold,
+            "start": start_ts, "end": end_ts, "duration_s": (end_ts - start_ts + step).total_seconds(),
+            "peak": float(r.peak), "peak_ts": to_utc(r.peak_ts), "points": int(r.points),
+        })
+    return out
 
-    return [{"ts": r.ts, "yhat": float(r.yhat)} for r in df_pred.itertuples(index=False)]
+@app.get("/forecast", response_model=list[ForecastPoint])
+async def forecast(
+    request: Request,
+    region: str = Query("DE"),
+    horizon: int = Query(24, ge=1, le=MAX_HORIZON),
+    mode: str = Query("direct", pattern=f"^({'|'.join(MODES)})$", description="direct (one model per horizon bucket) | recursive"),
+    fmt: str | None = Query(None, alias="format", description="json | arrow | parquet (default: Accept header, else json)"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Inference only: the model for the current data watermark comes from the
+    registry (trained after each ingest). While it is missing, the newest
+    older model of the region is used and training starts in the background;
+    without any model the answer is 503 with Retry-After.
+    Future hours use the stored Open-Meteo forecasts from weather_hourly.
+    """
+    kind = negotiate(request, fmt)
+    load_id = await aget_series_id(db, region, "load", "hour")
+    if load_id is None:
+        raise HTTPException(status_code=400, detail=f"No hourly load series for region {region} yet.")
 
-def _scheduled_ingest():
+    deps = registry.model_deps(load_id)
+    versions, data_modified = await acurrent_versions(db, deps)
+    wm = registry.watermark(versions, data_modified)
+    bundle = await run_in_threadpool(registry.get_model, region, wm)
+    if bundle is None:
+        error = registry.last_error(region, wm)
+        if error is None:
+            registry.request_training(region)
+        bundle = await run_in_threadpool(registry.latest_model, region)
+        if bundle is None:
+            if error is not None:
+                raise HTTPException(status_code=400, detail=error)
+            raise HTTPException(
+                status_code=503,
+                detail=f"No forecast model for {region} yet; training has started.",
+                headers={"Retry-After": "30"},
+            )
+
+    used = bundle["watermark"]
+    # the weather input is current even when the model is not; the cache entry
+    # is keyed like the ETag so a 200 never carries another variant's body
+    key = ("forecast", region, horizon, mode, kind, bundle["feature_set"], used, wm)
+    etag = make_etag(*key)
+    last_modified = max(t for t in (bundle["trained_at"], data_modified) if t is not None)
+    if is_fresh(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    async def compute():
+        origin = bundle["tail"]["ts"].iloc[-1]
+        weather = await aread_weather(db, origin + pd.Timedelta(hours=1), origin + pd.Timedelta(hours=horizon + 2))
+        return await run_in_threadpool(forecast_from_model, bundle, horizon, weather, mode)
+
+    df_pred = await response_cache.aget_or_compute(key, deps, compute)
+    resp = await run_in_threadpool(frame_response, request, df_pred, fmt=kind, value_cols=["yhat"])
+    resp.headers["X-Model-Watermark"] = used
+    if used != wm:
+        resp.headers["X-Model-Stale"] = "true"
+    return with_validators(resp, etag, last_modified)
+
+@app.get("/models", response_model=list[ModelInfo])
+async def models(region: str | None = Query(None), db: AsyncSession = Depends(get_async_db)):
+    """Newest trained forecast model per region and its cost (fit / predict time, size) per horizon model."""
+    await db.run_sync(load_catalog)
+    out = []
+    for r in [region] if region else registry.model_regions():
+        load_id = await aget_series_id(db, r, "load", "hour")
+        bundle = await run_in_threadpool(registry.latest_model, r) if load_id is not None else None
+        if bundle is None:
+            continue
+        wm = registry.watermark(*await acurrent_versions(db, registry.model_deps(load_id)))
+        out.append({**registry.model_info(bundle), "stale": bundle["watermark"] != wm})
+    return out
+
+_BACKTEST_RUN_COLS = (
+    "id", "created_at", "region", "backend", "feature_set", "folds", "quantile", "budget_s", "workers", "wall_s",
+)
+_BACKTEST_SCORE_COLS = ("mae", "mape", "pinball", "train_s", "predict_s", "model_bytes")
+
+def _backtest_out(run: BacktestRun, scores: list, **extra) -> dict:
+    return {
+        **{c: getattr(run, c) for c in _BACKTEST_RUN_COLS},
+        "horizons": [int(h) for h in run.horizons.split(",")],
+        "scores": scores,
+        **extra,
+    }
+
+async def _backtest_scores(db: AsyncSession, run_ids: list[int]) -> dict:
+    R = BacktestResult
+    rows = (await db.execute(
+        select(R.run_id, R.mode, R.horizon, func.count(), *(func.avg(getattr(R, c)) for c in _BACKTEST_SCORE_COLS))
+        .where(R.run_id.in_(run_ids))
+        .group_by(R.run_id, R.mode, R.horizon)
+        .order_by(R.run_id, R.mode, R.horizon)
+    )).all()
+    out: dict = {}
+    for run_id, mode, horizon, folds, *avgs in rows:
+        out.setdefault(run_id, []).append({"mode": mode, "horizon": horizon, "folds": folds, **dict(zip(_BACKTEST_SCORE_COLS, avgs))})
+    return out
+
+@app.get("/backtests", response_model=list[BacktestRunOut])
+async def backtests(
+    region: str | None = Query(None),
+    backend: str | None = Query(None),
+    limit: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Backtest runs (python -m app.backtest), newest first, with mean error and
+    cost per mode and horizon over their folds.
+    """
+    q = select(BacktestRun).order_by(BacktestRun.id.desc()).limit(limit)
+    if region:
+        q = q.where(BacktestRun.region == region)
+    if backend:
+        q = q.where(BacktestRun.backend == backend)
+    runs = (await db.execute(q)).scalars().all()
+    scores = await _backtest_scores(db, [r.id for r in runs]) if runs else {}
+    return [_backtest_out(r, scores.get(r.id, [])) for r in runs]
+
+@app.get("/backtests/{run_id}", response_model=BacktestRunOut)
+async def backtest(run_id: int, db: AsyncSession = Depends(get_async_db)):
+    """One backtest run with the scores of every fold."""
+    run = await db.get(BacktestRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"No backtest run {run_id}.")
+    R = BacktestResult
+    folds = (await db.execute(select(R).where(R.run_id == run_id).order_by(R.cutoff, R.mode, R.horizon))).scalars().all()
+    results = [
+        {c: getattr(f, c) for c in ("cutoff", "mode", "horizon", "points", *_BACKTEST_SCORE_COLS)} for f in folds
+    ]
+    scores = await _backtest_scores(db, [run_id])
+    return _backtest_out(run, scores.get(run_id, []), results=results)
+
+def _ingest() -> bool:
     log.info("Starting ingestion run...")
     db = SessionLocal()
     try:
         run_ingestion(db)
         log.info("Ingestion completed.")
+        return True
     except Exception as e:
         log.exception("Ingestion failed: %s", e)
+        return False
+    finally:
+        db.close()
+
+def _scheduled_ingest():
+    if not _ingest():
+        return
+
+    # one model per data watermark, so /forecast only runs inference
+    db = SessionLocal()
+    try:
+        registry.train_all(db)
+    except Exception as e:
+        log.exception("Model training failed: %s", e)
     finally:
         db.close()
 
@@ -156,7 +582,15 @@ def start_scheduler():
     scheduler.start()
     scheduler_started = True
 
+@app.on_event("shutdown")
+async def stop_workers():
+    workers.shutdown()
+    await async_engine.dispose()
+
 @app.post("/ingest-now")
 def ingest_now():
-    _scheduled_ingest()
+    """Ingest synchronously; the models are trained in the background (minutes), not in the request."""
+    if _ingest():
+        for region in registry.model_regions():
+            registry.request_training(region)
     return {"status": "ingest triggered"}
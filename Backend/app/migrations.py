@@ -0,0 +1,127 @@
+import logging
+
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .aggregates import refresh_aggregates
+from .models import Series, SeriesAggregate, TimeSeriesPoint
+from .partitions import ensure_partitions
+
+log = logging.getLogger("energy_api.migrations")
+
+# create_all only creates missing tables; tables of an existing deployment are
+# brought to the current layout here, once, before it runs. Every step checks
+# the live schema first, so running them again is a no-op.
+
+
+def _weather_unique_ts(conn: Connection):
+    """weather_hourly.ts must be unique: it is the ON CONFLICT target of the weather upsert."""
+    insp = inspect(conn)
+    if not insp.has_table("weather_hourly"):
+        return
+    unique = [u["column_names"] for u in insp.get_unique_constraints("weather_hourly")]
+    unique += [ix["column_names"] for ix in insp.get_indexes("weather_hourly") if ix["unique"]]
+    if ["ts"] in unique:
+        return
+
+    # keep the newest row per hour
+    dropped = conn.execute(text(
+        "DELETE FROM weather_hourly WHERE ts IS NULL "
+        "OR id NOT IN (SELECT MAX(id) FROM weather_hourly WHERE ts IS NOT NULL GROUP BY ts)"
+    )).rowcount
+    # the plain index on ts becomes redundant
+    conn.execute(text("DROP INDEX IF EXISTS ix_weather_hourly_ts"))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE weather_hourly ADD CONSTRAINT uq_weather_hourly_ts UNIQUE (ts)"))
+    else:
+        conn.execute(text("CREATE UNIQUE INDEX ix_weather_hourly_ts ON weather_hourly (ts)"))
+    log.info("weather_hourly: %d duplicate rows removed, ts made unique", dropped)
+
+
+def _set_aside(conn: Connection, table: str, old: str):
+    """Rename a table out of the way; its index / key names are reused by the new table."""
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    insp = inspect(conn)
+    for ix in insp.get_indexes(old):
+        conn.execute(text(f'DROP INDEX "{ix["name"]}"'))
+    pk = insp.get_pk_constraint(old).get("name")
+    if pk and conn.dialect.name == "postgresql":
+        conn.execute(text(f'ALTER TABLE {old} RENAME CONSTRAINT "{pk}" TO "{old}_pkey"'))
+
+
+def _catalog_timeseries(conn: Connection):
+    """
+    Pre-catalog timeseries (region, metric, resolution, ts, value per row) ->
+    series catalog + (series_id, ts, value), partitioned on PostgreSQL.
+    Duplicate rows keep the newest; the day/week/month aggregates are rebuilt.
+    """
+    insp = inspect(conn)
+    if not insp.has_table("timeseries"):
+        return
+    cols = {c["name"] for c in insp.get_columns("timeseries")}
+    if "series_id" in cols:
+        return
+
+    Series.__table__.create(conn, checkfirst=True)
+    SeriesAggregate.__table__.create(conn, checkfirst=True)
+    conn.execute(text(
+        "INSERT INTO series (region, metric, resolution, unit) "
+        "SELECT DISTINCT region, metric, resolution, 'MWh' FROM timeseries t "
+        "WHERE region IS NOT NULL AND metric IS NOT NULL AND resolution IS NOT NULL AND NOT EXISTS ("
+        "  SELECT 1 FROM series s WHERE s.region = t.region AND s.metric = t.metric AND s.resolution = t.resolution)"
+    ))
+
+    _set_aside(conn, "timeseries", "timeseries_legacy")
+    TimeSeriesPoint.__table__.create(conn)
+    db = Session(bind=conn)
+    lo, hi = conn.execute(text("SELECT min(ts), max(ts) FROM timeseries_legacy")).one()
+    if lo is not None:
+        ensure_partitions(db, lo, hi)
+    copied = conn.execute(text(
+        "INSERT INTO timeseries (series_id, ts, value) "
+        "SELECT s.id, t.ts, t.value FROM timeseries_legacy t "
+        "JOIN series s ON s.region = t.region AND s.metric = t.metric AND s.resolution = t.resolution "
+        "WHERE t.ts IS NOT NULL "
+        + ("ORDER BY t.id DESC " if "id" in cols else "")
+        + "ON CONFLICT DO NOTHING"
+    )).rowcount
+    conn.execute(text("DROP TABLE timeseries_legacy"))
+
+    ranges = conn.execute(text("SELECT series_id, min(ts), max(ts) FROM timeseries GROUP BY series_id")).all()
+    for sid, first, last in ranges:
+        # SQLite hands back min/max as naive strings
+        refresh_aggregates(db, sid, pd.to_datetime(first, utc=True), pd.to_datetime(last, utc=True))
+    log.info("timeseries: %d rows moved to the series catalog layout (%d series)", copied, len(ranges))
+
+
+def _partition_timeseries(conn: Connection):
+    """PostgreSQL: a plain timeseries table becomes the monthly RANGE-partitioned parent partitions.py expects."""
+    if conn.dialect.name != "postgresql" or not inspect(conn).has_table("timeseries"):
+        return
+    relkind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = 'timeseries'::regclass")).scalar()
+    if relkind == "p":
+        return
+
+    _set_aside(conn, "timeseries", "timeseries_unpartitioned")
+    TimeSeriesPoint.__table__.create(conn)
+    lo, hi = conn.execute(text("SELECT min(ts), max(ts) FROM timeseries_unpartitioned")).one()
+    if lo is not None:
+        ensure_partitions(Session(bind=conn), lo, hi)
+    copied = conn.execute(text(
+        "INSERT INTO timeseries (series_id, ts, value) "
+        "SELECT series_id, ts, value FROM timeseries_unpartitioned ON CONFLICT DO NOTHING"
+    )).rowcount
+    conn.execute(text("DROP TABLE timeseries_unpartitioned"))
+    log.info("timeseries: partitioned by month, %d rows copied", copied)
+
+
+STEPS = [_weather_unique_ts, _catalog_timeseries, _partition_timeseries]
+
+
+def migrate(engine: Engine):
+    """Run every step in its own transaction; a failing step stops startup."""
+    for step in STEPS:
+        with engine.begin() as conn:
+            step(conn)
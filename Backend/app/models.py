@@ -1,25 +1,186 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Index
+from sqlalchemy import (
+    Column, Integer, SmallInteger, BigInteger, String, Float, REAL, DateTime,
+    ForeignKey, Index, PrimaryKeyConstraint, UniqueConstraint,
+)
 from .db import Base
 
+class Series(Base):
+    """Catalog of stored series; fact rows in timeseries only carry series.id."""
+    __tablename__ = "series"
+
+    # SQLite only autoincrements INTEGER PRIMARY KEY
+    id = Column(SmallInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    region = Column(String(16), nullable=False)
+    metric = Column(String(32), nullable=False)        # load, wind, solar
+    resolution = Column(String(16), nullable=False)    # hour, day, quarterhour
+    unit = Column(String(16), nullable=False, default="MWh")
+    filter_id = Column(String(32), nullable=True)      # SMARD filter the data came from
+
+    __table_args__ = (
+        UniqueConstraint("region", "metric", "resolution", name="uq_series_key"),
+    )
+
 class TimeSeriesPoint(Base):
     __tablename__ = "timeseries"
 
-    id = Column(Integer, primary_key=True, index=True)
-    region = Column(String(16), index=True)
-    metric = Column(String(32), index=True)        # load, wind, solar
-    resolution = Column(String(16), index=True)    # hour, day, 15min
-    ts = Column(DateTime(timezone=True), index=True)
+    # On PostgreSQL the table is range-partitioned by month on ts (see partitions.py).
+    # The composite primary key is the lookup index and the upsert target;
+    # BRIN on ts is the only other index.
+    series_id = Column(SmallInteger, ForeignKey("series.id"), nullable=False)
+    ts = Column(DateTime(timezone=True), nullable=False)
     value = Column(Float)
 
     __table_args__ = (
-        Index("ix_timeseries_lookup", "region", "metric", "resolution", "ts"),
+        PrimaryKeyConstraint("series_id", "ts", name="pk_timeseries"),
+        Index("ix_timeseries_ts_brin", "ts", postgresql_using="brin").ddl_if(dialect="postgresql"),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+
+class SeriesAggregate(Base):
+    """Per-series day/week/month summaries, refreshed for touched buckets after each ingest."""
+    __tablename__ = "timeseries_agg"
+
+    series_id = Column(SmallInteger, ForeignKey("series.id"), nullable=False)
+    period = Column(String(8), nullable=False)              # day, week, month
+    bucket = Column(DateTime(timezone=True), nullable=False)  # local bucket start, stored in UTC
+    count = Column(Integer, nullable=False)
+    sum = Column(Float)
+    min = Column(Float)
+    max = Column(Float)
+    sumsq = Column(Float)                                   # sum of squares -> variance
+
+    __table_args__ = (
+        PrimaryKeyConstraint("series_id", "period", "bucket", name="pk_timeseries_agg"),
     )
 
 class WeatherPoint(Base):
     __tablename__ = "weather_hourly"
 
     id = Column(Integer, primary_key=True, index=True)
-    ts = Column(DateTime(timezone=True), index=True)
+    ts = Column(DateTime(timezone=True), index=True, unique=True)
     temperature_2m = Column(Float, nullable=True)
     windspeed_10m = Column(Float, nullable=True)
     precipitation = Column(Float, nullable=True)
+
+class WeatherStationPoint(Base):
+    """Hourly weather per station; weather_hourly holds their weighted aggregate."""
+    __tablename__ = "weather_station_hourly"
+
+    station = Column(String(32), primary_key=True)
+    ts = Column(DateTime(timezone=True), primary_key=True)
+    temperature_2m = Column(Float, nullable=True)
+    windspeed_10m = Column(Float, nullable=True)
+    precipitation = Column(Float, nullable=True)
+
+class IngestWatermark(Base):
+    """One row per SMARD chunk that has been ingested for a series."""
+    __tablename__ = "ingest_watermarks"
+
+    filter_id = Column(String(32), primary_key=True)
+    region = Column(String(16), primary_key=True)
+    resolution = Column(String(16), primary_key=True)
+    chunk_ts = Column(BigInteger, primary_key=True)   # SMARD chunk timestamp (ms)
+    etag = Column(String(128), nullable=True)
+    last_modified = Column(String(64), nullable=True)
+    content_hash = Column(String(64), nullable=True)  # sha256 of the chunk body
+    ingested_at = Column(DateTime(timezone=True))
+
+class DataVersion(Base):
+    """
+    Data version per series ("series:<id>") and for the weather tables ("weather").
+    Ingestion bumps it whenever it writes; read endpoints derive ETags from it.
+    """
+    __tablename__ = "data_versions"
+
+    name = Column(String(32), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True))
+
+class AlertRule(Base):
+    """Threshold registered on a stored series; evaluated on every ingest (see events.py)."""
+    __tablename__ = "alert_rules"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    series_id = Column(SmallInteger, ForeignKey("series.id"), nullable=False)
+    op = Column(String(8), nullable=False)             # above, below
+    threshold = Column(Float, nullable=False)
+    name = Column(String(64), nullable=True)
+    created_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("series_id", "op", "threshold", name="uq_alert_rule"),
+    )
+
+class AlertEvent(Base):
+    """One run of consecutive points violating a rule, start_ts..end_ts inclusive."""
+    __tablename__ = "alert_events"
+
+    rule_id = Column(Integer, ForeignKey("alert_rules.id"), nullable=False)
+    start_ts = Column(DateTime(timezone=True), nullable=False)
+    end_ts = Column(DateTime(timezone=True), nullable=False)   # last violating point
+    peak = Column(Float)                                       # max (above) / min (below) within the run
+    peak_ts = Column(DateTime(timezone=True))
+    points = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("rule_id", "start_ts", name="pk_alert_events"),
+    )
+
+class FeatureRow(Base):
+    """
+    Forecast inputs of one hour of an hourly load series (forecast.feature_table
+    columns), maintained incrementally at ingest (see features.py). float32.
+    """
+    __tablename__ = "forecast_features"
+
+    series_id = Column(SmallInteger, ForeignKey("series.id"), nullable=False)
+    ts = Column(DateTime(timezone=True), nullable=False)
+    value = Column(REAL, nullable=False)
+    hour = Column(REAL)
+    dow = Column(REAL)
+    lag_1 = Column(REAL)
+    lag_2 = Column(REAL)
+    roll_6 = Column(REAL)
+    temperature_2m = Column(REAL)
+    windspeed_10m = Column(REAL)
+    precipitation = Column(REAL)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("series_id", "ts", name="pk_forecast_features"),
+    )
+
+class BacktestRun(Base):
+    """One rolling-origin backtest of a forecast backend over a region's history (see backtest.py)."""
+    __tablename__ = "backtest_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime(timezone=True))
+    region = Column(String(16), nullable=False)
+    backend = Column(String(16), nullable=False)
+    feature_set = Column(String(64), nullable=False)   # model key the results apply to
+    folds = Column(Integer, nullable=False)
+    horizons = Column(String(64), nullable=False)      # comma-separated hours, e.g. "6,24,72"
+    quantile = Column(Float, nullable=False)           # of the pinball loss
+    budget_s = Column(Float)                           # training time budget per model
+    workers = Column(Integer)
+    wall_s = Column(Float)                             # elapsed for all folds
+
+class BacktestResult(Base):
+    """Errors and cost of one fold (cutoff) and mode over hours 1..horizon after the cutoff."""
+    __tablename__ = "backtest_results"
+
+    run_id = Column(Integer, ForeignKey("backtest_runs.id"), nullable=False)
+    cutoff = Column(DateTime(timezone=True), nullable=False)   # trained on hours before it
+    mode = Column(String(16), nullable=False)                  # direct, recursive
+    horizon = Column(Integer, nullable=False)
+    points = Column(Integer, nullable=False)
+    mae = Column(Float)
+    mape = Column(Float)                                       # percent
+    pinball = Column(Float)
+    train_s = Column(Float)                                    # fit of the models the mode uses
+    predict_s = Column(Float)                                  # forecast of the longest horizon
+    model_bytes = Column(BigInteger)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("run_id", "cutoff", "mode", "horizon", name="pk_backtest_results"),
+    )
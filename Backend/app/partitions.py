@@ -0,0 +1,101 @@
+import logging
+import os
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+log = logging.getLogger("energy_api.partitions")
+
+PARENT = "timeseries"
+
+# months of history kept attached to timeseries; 0 keeps everything
+RETENTION_MONTHS = int(os.getenv("TIMESERIES_RETENTION_MONTHS", "0"))
+# detached partitions are moved here (still queryable, no longer scanned)
+ARCHIVE_SCHEMA = os.getenv("TIMESERIES_ARCHIVE_SCHEMA", "archive")
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def month_start(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.normalize().replace(day=1)
+
+
+def partition_name(month: pd.Timestamp) -> str:
+    return f"{PARENT}_p{month:%Y_%m}"
+
+
+def attached_partitions(db: Session) -> list[str]:
+    rows = db.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :parent
+            ORDER BY c.relname
+            """
+        ),
+        {"parent": PARENT},
+    )
+    return [r[0] for r in rows]
+
+
+def ensure_partitions(db: Session, start, end):
+    """
+    Create the monthly partitions covering [start, end] (UTC months) that do not
+    exist yet. Indexes declared on the parent (primary key, BRIN on ts) are
+    created on each new partition automatically. No-op outside PostgreSQL.
+    """
+    if not _is_postgres(db):
+        return
+
+    existing = set(attached_partitions(db))
+    for month in pd.date_range(month_start(start), month_start(end), freq="MS"):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        upper = month + pd.DateOffset(months=1)
+        db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        log.info("created partition %s", name)
+
+
+def detach_partitions_before(db: Session, cutoff, archive_schema: str = ARCHIVE_SCHEMA) -> list[str]:
+    """
+    Detach every monthly partition that ends on or before cutoff and move it to
+    archive_schema. The rows stay in the archived table; they just stop being
+    part of timeseries scans and index maintenance.
+    """
+    if not _is_postgres(db):
+        return []
+
+    cutoff = month_start(cutoff)
+    detached = []
+    for name in attached_partitions(db):
+        month = pd.Timestamp(f"{name[-7:-3]}-{name[-2:]}-01", tz="UTC")
+        if month + pd.DateOffset(months=1) > cutoff:
+            continue
+        db.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+        db.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+        detached.append(name)
+        log.info("detached partition %s -> %s", name, archive_schema)
+    return detached
+
+
+def archive_old_partitions(db: Session) -> list[str]:
+    """Apply TIMESERIES_RETENTION_MONTHS (no-op when 0)."""
+    if RETENTION_MONTHS <= 0:
+        return []
+    cutoff = month_start(pd.Timestamp.now(tz="UTC")) - pd.DateOffset(months=RETENTION_MONTHS)
+    return detach_partitions_before(db, cutoff)
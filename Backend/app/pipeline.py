@@ -0,0 +1,175 @@
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger("energy_api.pipeline")
+
+_DONE = object()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.rows = 0
+        self.busy = 0.0     # seconds spent doing the stage's own work
+        self.waiting = 0.0  # seconds blocked on the input queue (starved)
+        self.blocked = 0.0  # seconds blocked on the output queue (backpressure)
+        self._lock = threading.Lock()
+
+    def add(self, busy: float, items: int = 1, rows: int = 0):
+        with self._lock:
+            self.items += items
+            self.rows += rows
+            self.busy += busy
+
+    def summary(self, wall: float) -> str:
+        rate = self.items / wall if wall > 0 else 0.0
+        return (
+            f"{self.name}: {self.items} items, {self.rows} rows, {rate:.1f} items/s, "
+            f"busy {self.busy:.2f}s, starved {self.waiting:.2f}s, backpressured {self.blocked:.2f}s"
+        )
+
+
+def _timed_get(q: queue.Queue, stats: StageStats):
+    t = time.perf_counter()
+    item = q.get()
+    stats.waiting += time.perf_counter() - t
+    return item
+
+
+def _timed_put(q: queue.Queue, item, stats: StageStats):
+    t = time.perf_counter()
+    q.put(item)
+    with stats._lock:
+        stats.blocked += time.perf_counter() - t
+
+
+def run_pipeline(
+    jobs: list,
+    fetch,
+    parse,
+    write,
+    fetch_workers: int = 8,
+    queue_size: int = 16,
+    batch_size: int = 8,
+) -> dict:
+    """
+    Three-stage pipeline:
+
+      fetch(job) -> resp          N fetcher threads         -> raw queue (bounded)
+      parse(job, resp) -> item    1 parser thread           -> parsed queue (bounded)
+      write([item, ...])          calling thread, coalesces up to batch_size items
+
+    Bounded queues give backpressure: a slow writer stalls the parser, which
+    stalls the fetchers. fetch returning None / parse returning None drops the
+    job. write runs on the calling thread so it can own the DB session.
+    Returns the per-stage StageStats.
+    """
+    stats = {name: StageStats(name) for name in ("fetch", "parse", "write")}
+    job_q: queue.Queue = queue.Queue()
+    raw_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    parsed_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    errors: list = []
+    stop = threading.Event()
+    started = time.perf_counter()
+
+    for job in jobs:
+        job_q.put(job)
+
+    def _fetcher():
+        st = stats["fetch"]
+        while not stop.is_set():
+            try:
+                job = job_q.get_nowait()
+            except queue.Empty:
+                return
+            t = time.perf_counter()
+            try:
+                resp = fetch(job)
+            except Exception as e:  # keep the other fetchers going
+                log.warning("fetch failed for %s: %s", job, e)
+                resp = None
+            st.add(time.perf_counter() - t)
+            if resp is not None:
+                _timed_put(raw_q, (job, resp), st)
+
+    def _parser():
+        st = stats["parse"]
+        try:
+            while True:
+                got = _timed_get(raw_q, st)
+                if got is _DONE:
+                    break
+                t = time.perf_counter()
+                item = parse(*got)
+                st.add(time.perf_counter() - t)
+                if item is not None:
+                    _timed_put(parsed_q, item, st)
+        except Exception as e:
+            errors.append(e)
+            # stop fetching, then drain so blocked fetchers can finish
+            stop.set()
+            while raw_q.get() is not _DONE:
+                pass
+        finally:
+            parsed_q.put(_DONE)
+
+    fetchers = [
+        threading.Thread(target=_fetcher, name=f"pipeline-fetch-{i}", daemon=True)
+        for i in range(max(1, min(fetch_workers, len(jobs))))
+    ]
+    parser = threading.Thread(target=_parser, name="pipeline-parse", daemon=True)
+    for th in fetchers:
+        th.start()
+    parser.start()
+
+    def _close_fetch():
+        for th in fetchers:
+            th.join()
+        raw_q.put(_DONE)
+
+    closer = threading.Thread(target=_close_fetch, name="pipeline-close", daemon=True)
+    closer.start()
+
+    # writer: coalesce whatever is queued (up to batch_size) into one write
+    st = stats["write"]
+    done = False
+    try:
+        while not done:
+            item = _timed_get(parsed_q, st)
+            if item is _DONE:
+                break
+            batch = [item]
+            while len(batch) < batch_size:
+                try:
+                    nxt = parsed_q.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _DONE:
+                    done = True
+                    break
+                batch.append(nxt)
+            t = time.perf_counter()
+            rows = write(batch)
+            st.add(time.perf_counter() - t, items=len(batch), rows=rows or 0)
+    except Exception:
+        # stop fetching and unblock the upstream stages before re-raising
+        stop.set()
+        if not done:
+            while parsed_q.get() is not _DONE:
+                pass
+        raise
+
+    parser.join()
+    closer.join()
+    if errors:
+        raise errors[0]
+
+    wall = time.perf_counter() - started
+    for s in stats.values():
+        log.info("pipeline %s", s.summary(wall))
+    return stats
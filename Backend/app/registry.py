@@ -0,0 +1,199 @@
+import glob
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .features import read_features
+from .forecast import FORECAST_BACKEND, feature_table, join_weather, model_set, train_model
+from .series import get_series_id, load_catalog, series_keys
+from .store import read_series, read_weather, weather_range
+from .versions import WEATHER, current_versions, series_version_name
+from . import workers
+
+log = logging.getLogger("energy_api.registry")
+
+# trained forecast models: MODEL_DIR/region=<r>/<backend>-<feature set>/<watermark>.joblib
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+# models kept deserialized in memory (LRU) and on disk per region / feature set
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "4"))
+MODEL_KEEP = int(os.getenv("MODEL_KEEP", "3"))
+MIN_TRAIN_ROWS = 24
+
+_models: OrderedDict = OrderedDict()   # (region, watermark) -> bundle
+_errors: dict = {}                     # region -> (watermark, message) of the last failed training
+_training: set = set()                 # regions with a background training running
+_lock = threading.Lock()
+
+
+def model_deps(load_id: int) -> list[str]:
+    """Data versions a forecast model depends on."""
+    return [series_version_name(load_id), WEATHER]
+
+
+def watermark(versions: tuple, modified: pd.Timestamp | None) -> str:
+    """
+    (('series:12', 5), ('weather', 7)), 2026-10-17 08:30:00.25 UTC
+    -> 'series12.5-weather.7-t20261017T083000250000'.
+    The counters restart at 1 on a fresh or restored database; the time of
+    the last write (current_versions) keeps its keys apart from models
+    trained on other data that are still in MODEL_DIR.
+    """
+    stamp = modified.tz_convert("UTC").strftime("%Y%m%dT%H%M%S%f") if modified is not None else "0"
+    return "-".join(f"{name.replace(':', '')}.{v}" for name, v in versions) + f"-t{stamp}"
+
+
+def _region_dir(region: str) -> str:
+    return os.path.join(MODEL_DIR, f"region={region}", model_set())
+
+
+def _path(region: str, wm: str) -> str:
+    return os.path.join(_region_dir(region), f"{wm}.joblib")
+
+
+def _remember(region: str, wm: str, bundle: dict):
+    with _lock:
+        _models[(region, wm)] = bundle
+        _models.move_to_end((region, wm))
+        while len(_models) > MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+
+
+def get_model(region: str, wm: str) -> dict | None:
+    """Model for exactly this data watermark: memory, then disk, else None."""
+    with _lock:
+        bundle = _models.get((region, wm))
+        if bundle is not None:
+            _models.move_to_end((region, wm))
+            return bundle
+    path = _path(region, wm)
+    if not os.path.exists(path):
+        return None
+    bundle = joblib.load(path)
+    _remember(region, wm, bundle)
+    return bundle
+
+
+def latest_model(region: str) -> dict | None:
+    """Most recently trained model of the region (any watermark), for use while a newer one trains."""
+    paths = glob.glob(os.path.join(_region_dir(region), "*.joblib"))
+    if not paths:
+        return None
+    newest = max(paths, key=os.path.getmtime)
+    return get_model(region, os.path.basename(newest)[: -len(".joblib")])
+
+
+def last_error(region: str, wm: str) -> str | None:
+    err = _errors.get(region)
+    return err[1] if err and err[0] == wm else None
+
+
+def _save(region: str, wm: str, bundle: dict):
+    path = _path(region, wm)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    joblib.dump(bundle, tmp, compress=3)
+    os.replace(tmp, path)
+
+    # keep the newest MODEL_KEEP files per region / feature set
+    paths = sorted(glob.glob(os.path.join(_region_dir(region), "*.joblib")), key=os.path.getmtime)
+    for old in paths[:-MODEL_KEEP]:
+        os.remove(old)
+
+
+def history_table(db: Session, load_id: int) -> pd.DataFrame:
+    """
+    float32 feature table of a load series from the feature store; computed
+    from load + weather only while the store is not built yet (first ingest).
+    ValueError if there is too little history.
+    """
+    table = read_features(db, load_id)
+    if table.empty:
+        w_min, w_max = weather_range(db)
+        if pd.isna(w_min) or pd.isna(w_max):
+            raise ValueError("No weather data available yet in weather_hourly.")
+        table = feature_table(join_weather(read_series(db, load_id, w_min, w_max), read_weather(db, w_min, w_max)))
+    rows = int(table["value"].notna().sum()) if len(table) else 0
+    if rows < MIN_TRAIN_ROWS:
+        raise ValueError(f"Not enough merged load+weather rows (have {rows}, need >= {MIN_TRAIN_ROWS}).")
+    return table
+
+
+def train_region(db: Session, region: str) -> dict | None:
+    """
+    Train (once) the model for the region's current data watermark and
+    persist it. Fitting runs in the CPU worker processes. Returns the bundle,
+    or None if the region has no hourly load series.
+    """
+    load_id = get_series_id(db, region, "load", "hour")
+    if load_id is None:
+        return None
+    wm = watermark(*current_versions(db, model_deps(load_id)))
+    bundle = get_model(region, wm)
+    if bundle is not None:
+        return bundle
+
+    try:
+        table = history_table(db, load_id)
+        bundle = workers.cpu_pool().submit(train_model, table, FORECAST_BACKEND).result()
+    except ValueError as e:
+        _errors[region] = (wm, str(e))
+        log.warning("model for %s @ %s not trained: %s", region, wm, e)
+        return None
+
+    bundle.update(region=region, watermark=wm, trained_at=pd.Timestamp.now(tz="UTC"))
+    _save(region, wm, bundle)
+    _remember(region, wm, bundle)
+    _errors.pop(region, None)
+    st = bundle["stats"]["recursive"]
+    log.info(
+        "trained %s model %s @ %s on %d rows: fit %.1fs (all horizons %.1fs), %.1f MB, predict %.1f ms",
+        bundle["backend"], region, wm, bundle["rows"], st["fit_s"],
+        st["fit_s"] + sum(d["fit_s"] for d in bundle["stats"]["direct"] if d),
+        (st["size_bytes"] + sum(d["size_bytes"] for d in bundle["stats"]["direct"] if d)) / 2**20, st["predict_ms"],
+    )
+    return bundle
+
+
+def model_info(bundle: dict) -> dict:
+    """What a model is and what it cost, without the estimators."""
+    info = {k: bundle[k] for k in ("region", "watermark", "feature_set", "trained_at", "rows")}
+    # models persisted before backends were pluggable: random forest, no cost stats
+    return {**info, "backend": bundle.get("backend", "rf"), "stats": bundle.get("stats", {})}
+
+
+def model_regions() -> list[str]:
+    """Regions with an hourly load series (catalog must be loaded)."""
+    return sorted({r for r, m, res in series_keys() if m == "load" and res == "hour"})
+
+
+def train_all(db: Session) -> int:
+    """After ingestion: bring the model of every region with hourly load up to date."""
+    load_catalog(db)
+    return sum(train_region(db, region) is not None for region in model_regions())
+
+
+def request_training(region: str):
+    """Train in a background thread unless one is already running for the region."""
+    with _lock:
+        if region in _training:
+            return
+        _training.add(region)
+
+    def run():
+        db = SessionLocal()
+        try:
+            train_region(db, region)
+        except Exception:
+            log.exception("background training for %s failed", region)
+        finally:
+            db.close()
+            with _lock:
+                _training.discard(region)
+
+    threading.Thread(target=run, name=f"train-{region}", daemon=True).start()
@@ -0,0 +1,135 @@
+import os
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .bulk import upsert_frame
+from .models import TimeSeriesPoint
+from .series import get_series_id
+
+# SMARD buckets hours/days in German local time
+ROLLUP_TZ = os.getenv("ROLLUP_TZ", "Europe/Berlin")
+
+BASE_RESOLUTION = "quarterhour"
+BASE_STEP = pd.Timedelta(minutes=15)
+
+# derived resolution -> (postgres date_trunc unit, pandas resample rule)
+DERIVED = {
+    "hour": ("hour", "h"),
+    "day": ("day", "D"),
+}
+
+
+def _bucket_bounds(resolution: str, start, end) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """[lo, hi) covering every bucket that start..end touches, in UTC."""
+    start = pd.Timestamp(start).tz_convert(ROLLUP_TZ)
+    end = pd.Timestamp(end).tz_convert(ROLLUP_TZ)
+    if resolution == "day":
+        lo = start.normalize()
+        hi = end.normalize() + pd.DateOffset(days=1)  # calendar day, DST-safe
+    else:
+        lo = start.tz_convert("UTC").floor("h")
+        hi = end.tz_convert("UTC").floor("h") + pd.Timedelta(hours=1)
+    return lo.tz_convert("UTC"), hi.tz_convert("UTC")
+
+
+def rollup_series(db: Session, region: str, metric: str, start, end, resolutions=("hour", "day")) -> int:
+    """
+    Rebuild the derived hour/day rows of one series for the buckets touched by
+    quarter-hour data in [start, end]. Values are summed (SMARD reports energy
+    per interval, so an hour is the sum of its four quarter-hours). Only
+    complete buckets are written, so the still-open hour/day appears once
+    its last quarter-hour has arrived. Runs inside the caller's transaction.
+    """
+    base_id = get_series_id(db, region, metric, BASE_RESOLUTION)
+    if base_id is None:
+        return 0
+
+    written = 0
+    for resolution in resolutions:
+        target_id = get_series_id(db, region, metric, resolution)
+        if target_id is None:
+            continue
+        lo, hi = _bucket_bounds(resolution, start, end)
+        if db.get_bind().dialect.name == "postgresql":
+            written += _rollup_sql(db, base_id, target_id, resolution, lo, hi)
+        else:
+            written += _rollup_pandas(db, base_id, target_id, resolution, lo, hi)
+    return written
+
+
+def _rollup_sql(db: Session, base_id: int, target_id: int, resolution: str, lo, hi) -> int:
+    unit = DERIVED[resolution][0]
+    if resolution == "day":
+        # local calendar days; 23/25h on DST switches
+        bucket = f"date_trunc('{unit}', ts AT TIME ZONE :tz) AT TIME ZONE :tz"
+        length = f"EXTRACT(EPOCH FROM ((b AT TIME ZONE :tz) + INTERVAL '1 {unit}') AT TIME ZONE :tz - b)"
+    else:
+        # hours are floored in UTC: on the fall-back night both local 02:00 hours
+        # would otherwise truncate to the same bucket
+        bucket = f"date_trunc('{unit}', ts AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'"
+        length = f"EXTRACT(EPOCH FROM INTERVAL '1 {unit}')"
+    result = db.execute(
+        text(
+            f"""
+            INSERT INTO timeseries (series_id, ts, value)
+            SELECT :target_id, b, SUM(value)
+            FROM (
+                SELECT value, {bucket} AS b
+                FROM timeseries
+                WHERE series_id = :base_id
+                  AND ts >= :lo AND ts < :hi
+            ) q
+            GROUP BY b
+            -- complete buckets only
+            HAVING COUNT(value) * :step = {length}
+            ON CONFLICT (series_id, ts)
+            DO UPDATE SET value = EXCLUDED.value
+            WHERE timeseries.value IS DISTINCT FROM EXCLUDED.value
+            """
+        ),
+        {
+            "base_id": base_id,
+            "target_id": target_id,
+            "tz": ROLLUP_TZ,
+            "step": int(BASE_STEP.total_seconds()),
+            "lo": lo.to_pydatetime(),
+            "hi": hi.to_pydatetime(),
+        },
+    )
+    return result.rowcount or 0
+
+
+def _rollup_pandas(db: Session, base_id: int, target_id: int, resolution: str, lo, hi) -> int:
+    T = TimeSeriesPoint
+    rows = (
+        db.query(T.ts, T.value)
+        .filter(T.series_id == base_id)
+        .filter(T.ts >= lo.to_pydatetime(), T.ts < hi.to_pydatetime())
+        .all()
+    )
+    if not rows:
+        return 0
+
+    s = pd.DataFrame(rows, columns=["ts", "value"])
+    s["ts"] = pd.to_datetime(s["ts"], utc=True)
+    s = s.set_index(s["ts"].dt.tz_convert(ROLLUP_TZ))["value"]
+
+    agg = s.resample(DERIVED[resolution][1]).agg(["sum", "count"])
+    bucket_end = agg.index.to_series().shift(-1)
+    if resolution == "day":
+        bucket_end.iloc[-1] = agg.index[-1] + pd.DateOffset(days=1)
+    else:
+        bucket_end.iloc[-1] = agg.index[-1] + pd.Timedelta(hours=1)
+    expected = (bucket_end - agg.index.to_series()) / BASE_STEP
+    agg = agg[agg["count"] == expected]
+    if agg.empty:
+        return 0
+
+    out = pd.DataFrame({
+        "series_id": target_id,
+        "ts": agg.index.tz_convert("UTC"),
+        "value": agg["sum"].astype(float).to_numpy(),
+    })
+    return upsert_frame(db, T.__table__, out, key_cols=["series_id", "ts"])
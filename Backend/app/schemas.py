@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Literal
 
 class TSPoint(BaseModel):
     ts: datetime
@@ -8,3 +9,106 @@ class TSPoint(BaseModel):
 class ForecastPoint(BaseModel):
     ts: datetime
     yhat: float
+
+class AggregatePoint(BaseModel):
+    bucket: datetime
+    count: int
+    sum: float | None
+    mean: float | None
+    min: float | None
+    max: float | None
+    std: float | None
+
+class WindowStats(BaseModel):
+    start: datetime
+    end: datetime
+    count: int
+    mean: float | None
+    std: float | None
+    min: float | None
+    max: float | None
+    quantiles: dict[str, float | None]
+    last_ts: datetime | None
+    last: float | None
+
+class AlertRuleIn(BaseModel):
+    region: str = "DE"
+    metric: str
+    resolution: str = "hour"
+    op: Literal["above", "below"] = "above"
+    threshold: float
+    name: str | None = None
+
+class AlertRuleOut(BaseModel):
+    id: int
+    region: str
+    metric: str
+    resolution: str
+    op: str
+    threshold: float
+    name: str | None
+    created: bool = False
+    events_backfilled: int = 0
+
+class AlertEventOut(BaseModel):
+    rule_id: int | None  # None for ad-hoc thresholds
+    name: str | None
+    metric: str
+    op: str
+    threshold: float
+    start: datetime
+    end: datetime
+    duration_s: float
+    peak: float | None
+    peak_ts: datetime | None
+    points: int
+
+class ModelInfo(BaseModel):
+    region: str
+    watermark: str
+    stale: bool
+    backend: str
+    feature_set: str
+    trained_at: datetime
+    rows: int
+    # per model (recursive + one per horizon bucket): fit_s, units, size_bytes, predict_ms
+    stats: dict
+
+class BacktestScore(BaseModel):
+    # mean over the folds of a run
+    mode: str
+    horizon: int
+    folds: int
+    mae: float | None
+    mape: float | None
+    pinball: float | None
+    train_s: float | None
+    predict_s: float | None
+    model_bytes: float | None
+
+class BacktestFold(BaseModel):
+    cutoff: datetime
+    mode: str
+    horizon: int
+    points: int
+    mae: float | None
+    mape: float | None
+    pinball: float | None
+    train_s: float | None
+    predict_s: float | None
+    model_bytes: int | None
+
+class BacktestRunOut(BaseModel):
+    id: int
+    created_at: datetime | None
+    region: str
+    backend: str
+    feature_set: str
+    folds: int
+    horizons: list[int]
+    quantile: float
+    budget_s: float | None
+    workers: int | None
+    wall_s: float | None
+    scores: list[BacktestScore]
+    results: list[BacktestFold] | None = None
@@ -0,0 +1,88 @@
+import threading
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import Series
+
+# In-process copy of the series catalog: (region, metric, resolution) <-> id.
+# Ids never change once assigned, so the cache only ever grows.
+_ids: dict[tuple[str, str, str], int] = {}
+_keys: dict[int, tuple[str, str, str]] = {}
+_lock = threading.Lock()
+
+
+def load_catalog(db: Session):
+    rows = db.execute(select(Series.id, Series.region, Series.metric, Series.resolution)).all()
+    with _lock:
+        for sid, region, metric, resolution in rows:
+            _ids[(region, metric, resolution)] = sid
+            _keys[sid] = (region, metric, resolution)
+
+
+def series_keys() -> list[tuple[str, str, str]]:
+    """(region, metric, resolution) of every series in the loaded catalog."""
+    with _lock:
+        return list(_keys.values())
+
+
+def get_series_id(db: Session, region: str, metric: str, resolution: str) -> int | None:
+    """Cached lookup; reloads the catalog once on a miss. None if the series does not exist."""
+    key = (region, metric, resolution)
+    sid = _ids.get(key)
+    if sid is None:
+        load_catalog(db)
+        sid = _ids.get(key)
+    return sid
+
+
+async def aget_series_id(db: AsyncSession, region: str, metric: str, resolution: str) -> int | None:
+    """get_series_id for the async read path."""
+    key = (region, metric, resolution)
+    sid = _ids.get(key)
+    if sid is None:
+        await db.run_sync(load_catalog)
+        sid = _ids.get(key)
+    return sid
+
+
+def series_key(db: Session, series_id: int) -> tuple[str, str, str] | None:
+    """(region, metric, resolution) of a series id."""
+    key = _keys.get(series_id)
+    if key is None:
+        load_catalog(db)
+        key = _keys.get(series_id)
+    return key
+
+
+def ensure_series(
+    db: Session,
+    region: str,
+    metric: str,
+    resolution: str,
+    unit: str = "MWh",
+    filter_id: str | None = None,
+) -> int:
+    """
+    Get-or-create a catalog entry. New entries are committed on their own
+    connection so a cached id stays valid even if the caller rolls back;
+    call this before the caller's transaction starts writing.
+    """
+    sid = get_series_id(db, region, metric, resolution)
+    if sid is not None:
+        return sid
+
+    try:
+        with db.get_bind().begin() as conn:
+            conn.execute(
+                insert(Series).values(
+                    region=region, metric=metric, resolution=resolution, unit=unit, filter_id=filter_id,
+                )
+            )
+    except IntegrityError:
+        pass  # created concurrently by another worker
+
+    load_catalog(db)
+    return _ids[(region, metric, resolution)]
@@ -1,21 +1,135 @@
 import os
+import hashlib
+import threading
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 SMARD_BASE_URL = os.getenv("SMARD_BASE_URL", "https://www.smard.de/app")
 
+# Concurrency / retry tuning for the chunk fetcher
+SMARD_MAX_CONCURRENCY = int(os.getenv("SMARD_MAX_CONCURRENCY", "8"))
+SMARD_MAX_RETRIES = int(os.getenv("SMARD_MAX_RETRIES", "4"))
+SMARD_BACKOFF_FACTOR = float(os.getenv("SMARD_BACKOFF_FACTOR", "0.5"))
+
+_session = None
+_session_lock = threading.Lock()
+
+# per-host limit: never more than SMARD_MAX_CONCURRENCY requests in flight to SMARD
+_host_slots = threading.BoundedSemaphore(SMARD_MAX_CONCURRENCY)
+
+
+def get_session() -> requests.Session:
+    """
+    Shared keep-alive session. The connection pool is sized to the concurrency
+    limit so every worker thread reuses an open TLS connection.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=SMARD_MAX_RETRIES,
+                    backoff_factor=SMARD_BACKOFF_FACTOR,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset(["GET"]),
+                    respect_retry_after_header=True,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=SMARD_MAX_CONCURRENCY,
+                    max_retries=retry,
+                )
+                s = requests.Session()
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _session = s
+    return _session
+
+
+class ChunkResponse(NamedTuple):
+    not_modified: bool
+    data: dict | None
+    etag: str | None
+    last_modified: str | None
+    content_hash: str | None
+
+
+def _get(url: str, headers: dict | None = None) -> requests.Response:
+    with _host_slots:
+        r = get_session().get(url, headers=headers, timeout=30)
+    r.raise_for_status()
+    return r
+
+
+def _get_json(url: str) -> dict:
+    return _get(url).json()
+
+
 def fetch_index(filter_id: str, region: str, resolution: str) -> dict:
     """
     SMARD endpoint (documented via OpenAPI):
     /chart_data/{filter}/{region}/index_{resolution}.json
     """
     url = f"{SMARD_BASE_URL}/chart_data/{filter_id}/{region}/index_{resolution}.json"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return _get_json(url)
 
 def fetch_series(filter_id: str, region: str, resolution: str, timestamp: int) -> dict:
     url = f"{SMARD_BASE_URL}/chart_data/{filter_id}/{region}/{filter_id}_{region}_{resolution}_{timestamp}.json"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    return _get_json(url)
+
+
+def fetch_series_conditional(
+    filter_id: str,
+    region: str,
+    resolution: str,
+    timestamp: int,
+    etag: str | None = None,
+    last_modified: str | None = None,
+) -> ChunkResponse:
+    """
+    Like fetch_series, but sends If-None-Match / If-Modified-Since from a
+    previous ingest. A 304 comes back as not_modified=True with no data.
+    """
+    url = f"{SMARD_BASE_URL}/chart_data/{filter_id}/{region}/{filter_id}_{region}_{resolution}_{timestamp}.json"
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    r = _get(url, headers=headers)
+    if r.status_code == 304:
+        return ChunkResponse(True, None, etag, last_modified, None)
+
+    return ChunkResponse(
+        False,
+        r.json(),
+        r.headers.get("ETag"),
+        r.headers.get("Last-Modified"),
+        hashlib.sha256(r.content).hexdigest(),
+    )
+
+
+def map_concurrent(fn, items: list):
+    """
+    Run fn(item) for every item on a bounded thread pool sharing the pooled
+    session. Yields (item, result) in input order; result is None when the
+    request still failed after all retries or the body was not valid JSON.
+    """
+    def _one(item):
+        try:
+            return item, fn(item)
+        except (requests.RequestException, ValueError):
+            return item, None
+
+    if not items:
+        return
+
+    workers = min(SMARD_MAX_CONCURRENCY, len(items))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smard") as pool:
+        yield from pool.map(_one, items)
 
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import coldstore
+from .store import aread_series, to_utc
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _row(start, end, count, mean, std, mn, mx, qs, quantiles, last_ts, last) -> dict:
+    return {
+        "start": start,
+        "end": end,
+        "count": int(count or 0),
+        "mean": mean,
+        "std": std,
+        "min": mn,
+        "max": mx,
+        "quantiles": {f"{q:g}": v for q, v in zip(quantiles, qs or [None] * len(quantiles))},
+        "last_ts": last_ts,
+        "last": last,
+    }
+
+
+def frame_stats(df: pd.DataFrame, start, end, quantiles=QUANTILES) -> dict:
+    """pandas equivalent of the SQL below for one window of ts/value rows."""
+    v = df.dropna(subset=["value"])
+    x = v["value"].to_numpy(dtype=float)
+    if not len(x):
+        return _row(start, end, 0, None, None, None, None, None, quantiles, None, None)
+    return _row(
+        start, end, len(x), float(x.mean()), float(x.std(ddof=1)) if len(x) > 1 else None,
+        float(x.min()), float(x.max()), [float(q) for q in np.quantile(x, quantiles)], quantiles,
+        v["ts"].iloc[-1].to_pydatetime(), float(x[-1]),
+    )
+
+
+async def window_stats(db: AsyncSession, series_id: int, windows: list[tuple], quantiles=QUANTILES) -> list[dict]:
+    """
+    count/mean/std/min/max/quantiles/last for each (start, end) window of one
+    series. On PostgreSQL all windows are answered by one statement: a
+    VALUES list of windows, each joined laterally to one aggregate scan
+    (percentile_cont) and one index probe for the last value.
+    """
+    windows = [(to_utc(s), to_utc(e)) for s, e in windows]
+    cold_end = coldstore.cold_until(series_id)
+    if db.bind.dialect.name != "postgresql" or (cold_end is not None and min(s for s, _ in windows) < cold_end):
+        out = []
+        for s, e in windows:
+            df = await aread_series(db, series_id, s, e)
+            out.append(await run_in_threadpool(frame_stats, df, s, e, quantiles))
+        return out
+
+    values = ", ".join(
+        f"({i}, CAST(:lo{i} AS timestamptz), CAST(:hi{i} AS timestamptz))" for i in range(len(windows))
+    )
+    params = {"series_id": series_id, "qs": list(quantiles)}
+    for i, (s, e) in enumerate(windows):
+        params[f"lo{i}"], params[f"hi{i}"] = s.to_pydatetime(), e.to_pydatetime()
+
+    rows = (await db.execute(
+        text(
+            f"""
+            WITH w(i, lo, hi) AS (VALUES {values})
+            SELECT w.i, a.n, a.mean, a.std, a.min, a.max, a.qs, l.ts, l.value
+            FROM w
+            CROSS JOIN LATERAL (
+                SELECT count(value) AS n, avg(value) AS mean, stddev_samp(value) AS std,
+                       min(value) AS min, max(value) AS max,
+                       percentile_cont(CAST(:qs AS float8[])) WITHIN GROUP (ORDER BY value) AS qs
+                FROM timeseries
+                WHERE series_id = :series_id AND ts >= w.lo AND ts <= w.hi
+            ) a
+            LEFT JOIN LATERAL (
+                SELECT ts, value
+                FROM timeseries
+                WHERE series_id = :series_id AND ts >= w.lo AND ts <= w.hi AND value IS NOT NULL
+                ORDER BY ts DESC
+                LIMIT 1
+            ) l ON true
+            ORDER BY w.i
+            """
+        ),
+        params,
+    )).all()
+    return [
+        _row(*windows[i], n, mean, std, mn, mx, qs, quantiles, last_ts, last)
+        for i, n, mean, std, mn, mx, qs, last_ts, last in rows
+    ]
@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import coldstore
+from .models import TimeSeriesPoint, WeatherPoint
+
+
+def to_utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def _frame(rows, columns: list[str]) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    return df
+
+
+def _hot_query(series_id: int, start: pd.Timestamp, end: pd.Timestamp):
+    T = TimeSeriesPoint
+    return (
+        select(T.ts, T.value)
+        .where(T.series_id == series_id, T.ts >= start.to_pydatetime(), T.ts <= end.to_pydatetime())
+        .order_by(T.ts.asc())
+    )
+
+
+def _read_hot(db: Session, series_id: int, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    return _frame(db.execute(_hot_query(series_id, start, end)).all(), ["ts", "value"])
+
+
+def read_series_empty() -> pd.DataFrame:
+    return pd.DataFrame({"ts": pd.Series(dtype="datetime64[ns, UTC]"), "value": pd.Series(dtype=float)})
+
+
+def read_series(db: Session, series_id: int, start, end) -> pd.DataFrame:
+    """
+    ts (UTC) / value of one series with start <= ts <= end, ordered by ts.
+    Months already exported to the Parquet tier are read there with DuckDB;
+    only the remaining hot tail is queried from the database.
+    """
+    start, end = to_utc(start), to_utc(end)
+    parts = []
+
+    cold_end = coldstore.cold_until(series_id)
+    if cold_end is not None and start < cold_end:
+        parts.append(coldstore.read_cold(series_id, start, min(end, cold_end - pd.Timedelta(microseconds=1))))
+        start = cold_end
+    if start <= end:
+        parts.append(_read_hot(db, series_id, start, end))
+    return _concat_parts(parts)
+
+
+async def aread_series(db: AsyncSession, series_id: int, start, end) -> pd.DataFrame:
+    """read_series on an AsyncSession; the DuckDB part runs in the threadpool."""
+    start, end = to_utc(start), to_utc(end)
+    parts = []
+
+    cold_end = coldstore.cold_until(series_id)
+    if cold_end is not None and start < cold_end:
+        cold_hi = min(end, cold_end - pd.Timedelta(microseconds=1))
+        parts.append(await run_in_threadpool(coldstore.read_cold, series_id, start, cold_hi))
+        start = cold_end
+    if start <= end:
+        parts.append(_frame((await db.execute(_hot_query(series_id, start, end))).all(), ["ts", "value"]))
+    return _concat_parts(parts)
+
+
+async def astream_series(db: AsyncSession, series_id: int, start, end, batch_rows: int = 50_000):
+    """
+    Yield ts/value frames of one series in ts order, at most ~batch_rows each:
+    Parquet months one at a time, then the hot tail through a server-side
+    cursor. Memory stays flat regardless of the range.
+    """
+    start, end = to_utc(start), to_utc(end)
+
+    cold_end = coldstore.cold_until(series_id)
+    if cold_end is not None and start < cold_end:
+        cold_hi = min(end, cold_end - pd.Timedelta(microseconds=1))
+        for month in coldstore.cold_months(series_id, start, cold_hi):
+            df = await run_in_threadpool(coldstore.read_cold_month, series_id, month, start, cold_hi)
+            if not df.empty:
+                df["ts"] = pd.to_datetime(df["ts"], utc=True)
+                yield df
+        start = cold_end
+    if start > end:
+        return
+
+    result = await db.stream(_hot_query(series_id, start, end).execution_options(yield_per=batch_rows))
+    async for rows in result.partitions():
+        yield _frame(rows, ["ts", "value"])
+
+
+def _concat_parts(parts: list) -> pd.DataFrame:
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return read_series_empty()
+    df = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+    df["ts"] = pd.to_datetime(df["ts"], utc=True)
+    return df
+
+
+# query-time bucketing on /timeseries: fixed-length buckets aligned to the UTC epoch
+AGGS = ("mean", "min", "max", "sum", "first", "last", "p95")
+BUCKET_ORIGIN = pd.Timestamp("1970-01-01", tz="UTC")
+
+_AGG_SQL = {
+    "mean": "avg(value)",
+    "min": "min(value)",
+    "max": "max(value)",
+    "sum": "sum(value)",
+    "first": "(array_agg(value ORDER BY ts) FILTER (WHERE value IS NOT NULL))[1]",
+    "last": "(array_agg(value ORDER BY ts DESC) FILTER (WHERE value IS NOT NULL))[1]",
+    "p95": "percentile_cont(0.95) WITHIN GROUP (ORDER BY value)",
+}
+
+
+def bucket_frame(df: pd.DataFrame, stride: pd.Timedelta, agg: str) -> pd.DataFrame:
+    """pandas equivalent of the date_bin query: one row per bucket start."""
+    if df.empty:
+        return read_series_empty()
+    bucket = BUCKET_ORIGIN + ((df["ts"] - BUCKET_ORIGIN) // stride) * stride
+    g = df["value"].groupby(bucket.rename("ts"))
+    if agg == "p95":
+        out = g.quantile(0.95)
+    elif agg == "sum":
+        out = g.sum(min_count=1)
+    else:
+        out = getattr(g, agg)()
+    return out.astype(float).rename("value").reset_index()
+
+
+async def aread_bucketed(db: AsyncSession, series_id: int, start, end, stride: pd.Timedelta, agg: str) -> pd.DataFrame:
+    """
+    agg(value) per stride-long bucket of one series within [start, end].
+    On PostgreSQL this is one date_bin GROUP BY over the (series_id, ts)
+    primary key, so only the buckets leave the database. Other databases,
+    and ranges reaching into the Parquet tier, bucket the rows in pandas.
+    """
+    start, end = to_utc(start), to_utc(end)
+    cold_end = coldstore.cold_until(series_id)
+    if db.bind.dialect.name != "postgresql" or (cold_end is not None and start < cold_end):
+        df = await aread_series(db, series_id, start, end)
+        return await run_in_threadpool(bucket_frame, df, stride, agg)
+
+    rows = (await db.execute(
+        text(
+            f"""
+            SELECT date_bin(:stride, ts, :origin) AS b, {_AGG_SQL[agg]} AS v
+            FROM timeseries
+            WHERE series_id = :series_id AND ts >= :lo AND ts <= :hi
+            GROUP BY b
+            ORDER BY b
+            """
+        ),
+        {
+            "stride": stride.to_pytimedelta(),
+            "origin": BUCKET_ORIGIN.to_pydatetime(),
+            "series_id": series_id,
+            "lo": start.to_pydatetime(),
+            "hi": end.to_pydatetime(),
+        },
+    )).all()
+    return _frame(rows, ["ts", "value"]).astype({"value": float})
+
+
+# derived metric -> (input metrics, vectorized formula over the aligned frame)
+DERIVED_METRICS = {
+    "renewables": (("wind", "solar"), lambda d: d["wind"] + d["solar"]),
+    "conventional": (("load", "wind", "solar"), lambda d: np.clip(d["load"] - (d["wind"] + d["solar"]), 0, None)),
+    "renew_share": (
+        ("load", "wind", "solar"),
+        lambda d: np.where(d["load"] > 0, 100 * (d["wind"] + d["solar"]) / d["load"].where(d["load"] > 0), np.nan),
+    ),
+}
+
+
+async def aread_aligned(db: AsyncSession, series_ids: dict[str, int], start, end) -> pd.DataFrame:
+    """
+    Several series aligned on ts, one column per key of series_ids (NaN where
+    a series has no point). Hot data comes from one pivot query over the
+    (series_id, ts) primary key. If part of the range is in the Parquet tier,
+    each series is read through aread_series and outer-joined instead.
+    """
+    start, end = to_utc(start), to_utc(end)
+    names = list(series_ids)
+    if not names:
+        return pd.DataFrame({"ts": pd.Series(dtype="datetime64[ns, UTC]")})
+
+    if _any_cold(series_ids, start):
+        return _outer_join({name: await aread_series(db, sid, start, end) for name, sid in series_ids.items()})
+
+    rows = (await db.execute(_aligned_query(series_ids, start, end))).all()
+    return _frame(rows, ["ts", *names]).astype({n: float for n in names})
+
+
+def _any_cold(series_ids: dict[str, int], start: pd.Timestamp) -> bool:
+    return any((c := coldstore.cold_until(sid)) is not None and start < c for sid in series_ids.values())
+
+
+def _outer_join(frames: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    cols = [df.set_index("ts")["value"].rename(name) for name, df in frames.items()]
+    return pd.concat(cols, axis=1, join="outer").sort_index().rename_axis("ts").reset_index()
+
+
+def _aligned_query(series_ids: dict[str, int], start: pd.Timestamp, end: pd.Timestamp):
+    T = TimeSeriesPoint
+    cols = [func.max(case((T.series_id == sid, T.value))).label(name) for name, sid in series_ids.items()]
+    return (
+        select(T.ts, *cols)
+        .where(
+            T.series_id.in_(list(series_ids.values())),
+            T.ts >= start.to_pydatetime(),
+            T.ts <= end.to_pydatetime(),
+        )
+        .group_by(T.ts)
+        .order_by(T.ts.asc())
+    )
+
+
+WEATHER_COLS = ["ts", "temperature_2m", "windspeed_10m", "precipitation"]
+
+
+def _weather_range_query():
+    W = WeatherPoint
+    return select(func.min(W.ts), func.max(W.ts))
+
+
+def _weather_query(start, end):
+    W = WeatherPoint
+    return (
+        select(W.ts, W.temperature_2m, W.windspeed_10m, W.precipitation)
+        .where(W.ts >= to_utc(start).to_pydatetime(), W.ts <= to_utc(end).to_pydatetime())
+        .order_by(W.ts.asc())
+    )
+
+
+def weather_range(db: Session) -> tuple:
+    return tuple(db.execute(_weather_range_query()).one())
+
+
+def read_weather(db: Session, start, end) -> pd.DataFrame:
+    return _frame(db.execute(_weather_query(start, end)).all(), WEATHER_COLS)
+
+
+async def aread_weather(db: AsyncSession, start, end) -> pd.DataFrame:
+    return _frame((await db.execute(_weather_query(start, end))).all(), WEATHER_COLS)
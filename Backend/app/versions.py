@@ -0,0 +1,51 @@
+import pandas as pd
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .models import DataVersion
+
+WEATHER = "weather"
+
+
+def series_version_name(series_id: int) -> str:
+    return f"series:{series_id}"
+
+
+def bump_versions(db: Session, names) -> list[str]:
+    """+1 on every given data version (created at 1). Runs inside the caller's transaction."""
+    V = DataVersion
+    now = pd.Timestamp.now(tz="UTC").to_pydatetime()
+    names = sorted(set(names))
+    for name in names:
+        result = db.execute(update(V).where(V.name == name).values(version=V.version + 1, updated_at=now))
+        if not result.rowcount:
+            db.execute(insert(V).values(name=name, version=1, updated_at=now))
+    return names
+
+
+def current_versions(db: Session, names) -> tuple[tuple, pd.Timestamp | None]:
+    """
+    ((name, version), ...) in the order given, plus the latest updated_at (UTC)
+    among them. Data that was never written has version 0.
+    """
+    names = list(names)
+    return _versions(names, db.execute(_versions_query(names)))
+
+
+async def acurrent_versions(db: AsyncSession, names) -> tuple[tuple, pd.Timestamp | None]:
+    names = list(names)
+    return _versions(names, await db.execute(_versions_query(names)))
+
+
+def _versions_query(names: list[str]):
+    V = DataVersion
+    return select(V.name, V.version, V.updated_at).where(V.name.in_(names))
+
+
+def _versions(names: list[str], result) -> tuple[tuple, pd.Timestamp | None]:
+    rows = {n: (v, u) for n, v, u in result}
+    versions = tuple((n, rows[n][0] if n in rows else 0) for n in names)
+    stamps = [pd.Timestamp(rows[n][1]) for n in names if n in rows and rows[n][1] is not None]
+    stamps = [t.tz_localize("UTC") if t.tzinfo is None else t.tz_convert("UTC") for t in stamps]
+    return versions, (max(stamps) if stamps else None)
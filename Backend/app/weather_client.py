@@ -1,14 +1,71 @@
+import os
+from typing import NamedTuple
+
 import requests
 
-def fetch_openmeteo_hourly(lat: float, lon: float, timezone: str = "Europe/Berlin") -> dict:
+HOURLY_VARS = ["temperature_2m", "windspeed_10m", "precipitation"]
+
+
+class Station(NamedTuple):
+    name: str
+    lat: float
+    lon: float
+    weight: float
+
+
+# Largest German load centres, weighted by population (millions)
+DEFAULT_STATIONS = (
+    "berlin:52.52:13.405:3.7;"
+    "hamburg:53.551:9.994:1.9;"
+    "munich:48.137:11.575:1.5;"
+    "cologne:50.938:6.96:1.1;"
+    "frankfurt:50.11:8.682:0.77;"
+    "stuttgart:48.776:9.183:0.63;"
+    "duesseldorf:51.227:6.774:0.62;"
+    "leipzig:51.34:12.375:0.6;"
+    "dortmund:51.514:7.466:0.59;"
+    "hannover:52.376:9.732:0.54"
+)
+
+
+def load_stations(spec: str | None = None) -> list[Station]:
+    """
+    Parses WEATHER_STATIONS: "name:lat:lon:weight;name:lat:lon:weight;..."
+    """
+    spec = spec or os.getenv("WEATHER_STATIONS", DEFAULT_STATIONS)
+    stations = []
+    for part in spec.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        name, lat, lon, weight = part.split(":")
+        stations.append(Station(name.strip(), float(lat), float(lon), float(weight)))
+    return stations
+
+
+def fetch_openmeteo_hourly(lat: float | str, lon: float | str, timezone: str = "Europe/Berlin") -> dict:
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
         "latitude": lat,
         "longitude": lon,
-        "hourly": "temperature_2m,windspeed_10m,precipitation",
+        "hourly": ",".join(HOURLY_VARS),
         "timezone": timezone,
         "forecast_days": 7,
     }
     r = requests.get(url, params=params, timeout=30)
     r.raise_for_status()
     return r.json()
+
+
+def fetch_openmeteo_hourly_multi(stations: list[Station], timezone: str = "GMT") -> list[dict]:
+    """
+    One request for all stations (Open-Meteo takes comma-separated coordinate
+    lists and answers with one payload per location, in the same order).
+    """
+    payload = fetch_openmeteo_hourly(
+        ",".join(str(s.lat) for s in stations),
+        ",".join(str(s.lon) for s in stations),
+        timezone=timezone,
+    )
+    # a single location comes back as a plain object
+    return payload if isinstance(payload, list) else [payload]
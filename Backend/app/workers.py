@@ -0,0 +1,28 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# processes for CPU-bound request work (model training); keeps it off the event loop and the GIL
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "2"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def cpu_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: the API process runs scheduler and DB pool threads, which must not be forked
+                _pool = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+# app.db builds its engines at import time; without a DATABASE_URL the tests
+# run against a throwaway SQLite file (set one to test the PostgreSQL paths)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="energy-tests-"), "test.db"))
+
+import pytest  # noqa: E402
+
+from app.db import Base, SessionLocal, engine  # noqa: E402
+from app.migrations import migrate  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def schema():
+    migrate(engine)
+    Base.metadata.create_all(bind=engine)
+
+
+@pytest.fixture
+def db(schema):
+    """A session whose writes are rolled back after the test."""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from app import coldstore
+from app.aggregates import refresh_aggregates
+from app.bulk import upsert_frame
+from app.models import TimeSeriesPoint
+from app.partitions import ensure_partitions
+from app.series import ensure_series
+from app.store import read_series
+
+pytest.importorskip("duckdb")
+
+
+def _write(db, sid, ts, value):
+    ensure_partitions(db, ts[0], ts[-1])
+    upsert_frame(
+        db, TimeSeriesPoint.__table__,
+        pd.DataFrame({"series_id": sid, "ts": ts, "value": value}),
+        key_cols=["series_id", "ts"],
+    )
+
+
+def test_late_rows_reach_exported_month(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(coldstore, "COLD_STORE_DIR", str(tmp_path))
+    sid = ensure_series(db, "TEST", "wind", "hour")
+    ts = pd.date_range("2025-03-01", periods=48, freq="h", tz="UTC")
+    _write(db, sid, ts, 1.0)
+    refresh_aggregates(db, sid, ts[0], ts[-1])
+    assert coldstore.export_cold_months(db) >= 1
+
+    # a chunk refetched after the month went to Parquet
+    late = pd.DatetimeIndex([ts[-1] + pd.Timedelta(hours=1)])
+    _write(db, sid, late, 9.0)
+    assert len(read_series(db, sid, ts[0], late[0])) == 48
+
+    assert coldstore.refresh_cold_months(db, {sid: (late[0], late[0])}) == 1
+    df = read_series(db, sid, ts[0], late[0])
+    assert len(df) == 49
+    assert df["value"].iloc[-1] == 9.0
+    assert (df["value"].iloc[:-1] == 1.0).all()
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from app.bulk import upsert_frame
+from app.models import TimeSeriesPoint
+from app.partitions import ensure_partitions
+from app.rollup import ROLLUP_TZ, rollup_series
+from app.series import ensure_series
+from app.store import read_series
+
+
+def test_rollup_across_dst_fall_back(db):
+    # local day 2026-10-25 has 25 hours (CEST -> CET)
+    ids = {res: ensure_series(db, "TEST", "load", res) for res in ("quarterhour", "hour", "day")}
+    day = pd.Timestamp("2026-10-25", tz=ROLLUP_TZ)
+    start, end = day.tz_convert("UTC"), (day + pd.DateOffset(days=1)).tz_convert("UTC")
+    ts = pd.date_range(start, end, freq="15min", inclusive="left")
+    assert len(ts) == 100
+
+    ensure_partitions(db, start, end)
+    upsert_frame(
+        db, TimeSeriesPoint.__table__,
+        pd.DataFrame({"series_id": ids["quarterhour"], "ts": ts, "value": 1.0}),
+        key_cols=["series_id", "ts"],
+    )
+    rollup_series(db, "TEST", "load", ts[0], ts[-1])
+
+    hours = read_series(db, ids["hour"], start, end - pd.Timedelta(seconds=1))
+    assert len(hours) == 25
+    assert (hours["value"] == 4.0).all()
+    assert hours["ts"].is_unique
+
+    days = read_series(db, ids["day"], start, end - pd.Timedelta(seconds=1))
+    assert len(days) == 1
+    assert days["ts"].iloc[0] == start
+    assert days["value"].iloc[0] == 100.0
@@ -3,7 +3,7 @@ import pandas as pd
 import plotly.express as px
 from dateutil import tz
 
-from utils import REGIONS, METRICS, RESOLUTIONS, get_timeseries, pretty_unit
+from utils import REGIONS, METRICS, RESOLUTIONS, BUCKETS, AGGS, get_stats, get_timeseries, pretty_unit
 
 st.header("Compare Periods")
 
@@ -15,6 +15,8 @@ with st.sidebar:
     metric_label = st.selectbox("Metric", list(METRICS.keys()), index=0, key="cmp_metric")
     metric_key = METRICS[metric_label]
     resolution = st.selectbox("Resolution", RESOLUTIONS, index=1, key="cmp_res")
+    bucket = BUCKETS[st.selectbox("Bucket", list(BUCKETS), index=0, key="cmp_bucket")]
+    agg = st.selectbox("Aggregate", AGGS, index=0, key="cmp_agg", disabled=bucket is None)
 
     berlin = tz.gettz("Europe/Berlin")
     now = pd.Timestamp.now(tz=berlin).floor("h")  # use "h" not "H"
@@ -42,8 +44,8 @@ with st.sidebar:
     )
 
 # Fetch data
-df_a = get_timeseries(region, metric_key, resolution, a_start_ts, a_end_ts)
-df_b = get_timeseries(region, metric_key, resolution, b_start_ts, b_end_ts)
+df_a = get_timeseries(region, metric_key, resolution, a_start_ts, a_end_ts, bucket=bucket, agg=agg)
+df_b = get_timeseries(region, metric_key, resolution, b_start_ts, b_end_ts, bucket=bucket, agg=agg)
 
 if df_a.empty or df_b.empty:
     st.warning("One of the periods returned no data. Try a different date range or resolution.")
@@ -85,13 +87,16 @@ fig.update_layout(
 )
 st.plotly_chart(fig, use_container_width=True)
 
+# Summary over the full-resolution data, computed server-side for both periods in one request
+stats = get_stats(region, metric_key, resolution, [(a_start_ts, a_end_ts), (b_start_ts, b_end_ts)])
+
 st.subheader(" Summary")
 col1, col2 = st.columns(2)
 with col1:
     st.write("**Period A**")
     st.caption(f"{a_start_ts.date()} → {a_end_ts.date()}")
-    st.dataframe(df_a[["ts", "value"]].describe(), use_container_width=True)
+    st.dataframe(stats.iloc[0].drop("last_ts").rename("value").to_frame(), use_container_width=True)
 with col2:
     st.write("**Period B**")
     st.caption(f"{b_start_ts.date()} → {b_end_ts.date()}")
-    st.dataframe(df_b[["ts", "value"]].describe(), use_container_width=True)
+    st.dataframe(stats.iloc[1].drop("last_ts").rename("value").to_frame(), use_container_width=True)
@@ -1,10 +1,9 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
 from dateutil import tz
 
-from utils import get_timeseries
+from utils import api_get_timeseries_batch, get_events
 
 st.header("🌍 Energy Mix (Renewables vs Conventional)")
 
@@ -27,32 +26,27 @@ with st.sidebar:
     st.subheader("Highlight")
     peak_threshold = st.slider("Peak load threshold (MW)", 30000, 90000, 65000, step=500)
 
-# We combine multiple metrics (these will become real once API exists)
-metrics = {
-    "Load": "load",
-    "Wind": "wind",
-    "Solar": "solar",
-}
+# One request: load/wind/solar aligned on ts plus the derived mix columns
+df = api_get_timeseries_batch(
+    region="DE",
+    metric_keys=["load", "wind", "solar", "renewables", "conventional", "renew_share"],
+    resolution="hour",
+    start=start_ts,
+    end=end_ts,
+)
+if df.empty:
+    st.warning("No data returned for this period.")
+    st.stop()
+
+df = df.rename(columns={
+    "load": "Load",
+    "wind": "Wind",
+    "solar": "Solar",
+    "renewables": "Renewables",
+    "conventional": "Conventional",
+    "renew_share": "Renewables Share (%)",
+}).dropna(subset=["Load", "Wind", "Solar"])  # same rows as the old inner join
 
-dfs = {}
-for label, key in metrics.items():
-    dfs[label] = get_timeseries(
-        region="DE",
-        metric_key=key,
-        resolution="hour",
-        start=start_ts,
-        end=end_ts,
-    ).rename(columns={"value": label})
-
-# merge on timestamp
-df = dfs["Load"][["ts", "Load"]].copy()
-df = df.merge(dfs["Wind"][["ts", "Wind"]], on="ts", how="inner")
-df = df.merge(dfs["Solar"][["ts", "Solar"]], on="ts", how="inner")
-
-# Compute derived columns
-df["Renewables"] = df["Wind"] + df["Solar"]
-df["Conventional"] = np.clip(df["Load"] - df["Renewables"], 0, None)
-df["Renewables Share (%)"] = np.where(df["Load"] > 0, 100 * df["Renewables"] / df["Load"], np.nan)
 df["Peak"] = df["Load"] > peak_threshold
 
 # KPIs
@@ -70,10 +64,10 @@ st.plotly_chart(fig, use_container_width=True)
 fig2 = px.line(df, x="ts", y="Renewables Share (%)", title="Renewables Share Over Time")
 st.plotly_chart(fig2, use_container_width=True)
 
-# Peak table
+# Peak table: load-above-threshold intervals, computed server-side for the chosen threshold
 st.subheader("⏱ Peak Hours (Drill-down table)")
-peaks = df[df["Peak"]].sort_values("ts", ascending=False)[["ts", "Load", "Renewables", "Renewables Share (%)"]]
+peaks = get_events("DE", "load", "hour", float(peak_threshold), start_ts, end_ts)
 if peaks.empty:
     st.success("No peak hours in this period for the chosen threshold.")
 else:
-    st.dataframe(peaks, use_container_width=True)
+    st.dataframe(peaks.rename(columns={"peak": "Peak Load", "peak_ts": "Peak at", "points": "Hours"}), use_container_width=True)
@@ -6,7 +6,7 @@ from dateutil import tz
 import requests
 from streamlit_autorefresh import st_autorefresh
 
-from utils import REGIONS, METRICS, RESOLUTIONS, get_timeseries, pretty_unit
+from utils import REGIONS, METRICS, RESOLUTIONS, DERIVED_METRICS, get_events, get_stats, get_timeseries, pretty_unit
 
 # Auto-refresh (live feel): refresh page every 60 seconds
 st_autorefresh(interval=60 * 1000, key="live_refresh")
@@ -77,15 +77,17 @@ df["ts"] = pd.to_datetime(df["ts"])
 df = df.sort_values("ts")
 
 # Show latest ingested timestamp (helps users understand delays)
-latest_ts = df["ts"].max()
+# KPIs (computed server-side over the whole window, independent of the plotted points)
+kpi = get_stats(region, metric_key, resolution, [(start_ts, end_ts)]).iloc[0]
+
+latest_ts = kpi["last_ts"] if pd.notna(kpi["last_ts"]) else df["ts"].max()
 st.caption(f"Latest available timestamp in DB: **{latest_ts}**")
 
-# KPIs (computed from DataFrame)
 unit = pretty_unit(metric_key)
-last_val = float(df["value"].iloc[-1]) if not df.empty else None
-avg_val = float(df["value"].mean()) if not df.empty else None
-min_val = float(df["value"].min()) if not df.empty else None
-max_val = float(df["value"].max()) if not df.empty else None
+last_val = float(kpi["last"]) if pd.notna(kpi["last"]) else None
+avg_val = float(kpi["mean"]) if pd.notna(kpi["mean"]) else None
+min_val = float(kpi["min"]) if pd.notna(kpi["min"]) else None
+max_val = float(kpi["max"]) if pd.notna(kpi["max"]) else None
 
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Last", f"{last_val:.1f} {unit}" if last_val is not None else "—")
@@ -98,17 +100,29 @@ fig = px.line(df, x="ts", y="value", title=f"{metric_label} — {region} ({resol
 fig.update_layout(xaxis_title="Time", yaxis_title=f"Value ({unit})")
 st.plotly_chart(fig, use_container_width=True)
 
-# Threshold highlighting
+# Threshold highlighting: intervals are computed server-side for the chosen threshold
 if threshold_on:
-    exceed = df[df["value"] > threshold].copy()
     st.subheader("🚨 Threshold exceedances")
     st.write(f"Threshold: **{threshold:.1f} {unit}**")
 
-    if exceed.empty:
-        st.success("No exceedances in the selected time window.")
+    if metric_key in DERIVED_METRICS:
+        # derived metrics are not stored, so the backend has no series to scan
+        exceed = df[df["value"] > threshold].copy()
+        if exceed.empty:
+            st.success("No exceedances in the selected time window.")
+        else:
+            st.error(f"Found **{len(exceed)}** exceedance points.")
+            st.dataframe(exceed.sort_values("ts", ascending=False), use_container_width=True)
     else:
-        st.error(f"Found **{len(exceed)}** exceedance points.")
-        st.dataframe(exceed.sort_values("ts", ascending=False), use_container_width=True)
+        events = get_events(region, metric_key, resolution, threshold, start_ts, end_ts)
+        if events.empty:
+            st.success("No exceedances in the selected time window.")
+        else:
+            st.error(
+                f"Found **{len(events)}** exceedance intervals "
+                f"({int(events['points'].sum())} points, longest {events['duration'].max()})."
+            )
+            st.dataframe(events, use_container_width=True)
 
 # Drill-down (advanced interaction): pick a time window inside the selected range
 st.subheader("🔎 Drill-down (focus window)")
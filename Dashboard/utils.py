@@ -1,9 +1,26 @@
 import os
+from collections import OrderedDict
+
 import requests
 import pandas as pd
 
+try:
+    import pyarrow as pa
+except ImportError:  # falls back to JSON
+    pa = None
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
 DEFAULT_API_BASE = os.getenv("ENERGY_API_BASE", "http://127.0.0.1:8000")
 
+# Charts are a few hundred px wide: let the API decimate to this many points
+# (min/max per bucket, so peaks for threshold checks survive)
+DEFAULT_MAX_POINTS = int(os.getenv("ENERGY_MAX_POINTS", "2000"))
+
+# last ETag + decoded frame per request; the API answers 304 until the next ingest
+_REVALIDATE_MAX = 64
+_revalidate: OrderedDict = OrderedDict()
+
 
 # Regions available from SMARD-style data (market zones)
 REGIONS = ["DE"]  # add "DE-LU" later if you ingest it
@@ -13,12 +30,19 @@ METRICS = {
     "Load (MW)": "load",
     "Wind (MW)": "wind",
     "Solar (MW)": "solar",
-    "Renewables Share (%)": "renew_share",  # optional derived metric (not from API yet)
+    "Renewables Share (%)": "renew_share",  # derived server-side by /timeseries/batch
 }
 
+# metrics the API derives from load/wind/solar (only served by /timeseries/batch)
+DERIVED_METRICS = {"renewables", "conventional", "renew_share"}
+
 # SMARD resolutions
 RESOLUTIONS = ["quarterhour", "hour", "day"]
 
+# server-side bucketing (/timeseries bucket= & agg=); None = as stored
+BUCKETS = {"As stored": None, "6 hours": "6h", "1 day": "1D"}
+AGGS = ["mean", "min", "max", "sum", "first", "last", "p95"]
+
 
 def pretty_unit(metric_key: str) -> str:
     return "%" if metric_key == "renew_share" else "MW"
@@ -32,12 +56,16 @@ def api_get_timeseries(
     end: pd.Timestamp,
     api_base: str = DEFAULT_API_BASE,
     timeout: int = 30,
+    max_points: int | None = None,
+    bucket: str | None = None,
+    agg: str = "mean",
 ) -> pd.DataFrame:
     """
     Calls backend:
-      GET /timeseries?region=DE&metric=load&resolution=hour&start=...&end=...
+      GET /timeseries?region=DE&metric=load&resolution=hour&start=...&end=...[&max_points=N][&bucket=6h&agg=max]
 
-    Expects JSON list:
+    Asks for an Arrow IPC stream (typed timestamps + float64, decoded without
+    going through text) and falls back to the JSON list:
       [{"ts":"...","value":123.4}, ...]
     """
     url = f"{api_base.rstrip('/')}/timeseries"
@@ -48,7 +76,14 @@ def api_get_timeseries(
         "start": start.isoformat(),
         "end": end.isoformat(),
     }
-    r = requests.get(url, params=params, timeout=timeout)
+    if max_points:
+        params["max_points"] = max_points
+    if bucket:
+        params.update(bucket=bucket, agg=agg)
+    headers = {"Accept": f"{ARROW_STREAM}, application/json;q=0.5"} if pa is not None else {}
+    r, cached = _conditional_get(url, params, headers, timeout)
+    if cached is not None:
+        return cached
 
     if r.status_code != 200:
         raise RuntimeError(
@@ -57,6 +92,9 @@ def api_get_timeseries(
         )
 
     content_type = r.headers.get("content-type") or ""
+    if ARROW_STREAM in content_type and pa is not None:
+        return _remember(url, params, headers, r, arrow_to_frame(r.content))
+
     if "application/json" not in content_type:
         raise RuntimeError(
             f"Expected JSON but got Content-Type: {content_type}\n"
@@ -68,7 +106,76 @@ def api_get_timeseries(
     df = pd.DataFrame(data)
     if not df.empty:
         df["ts"] = pd.to_datetime(df["ts"])
-    return df
+    return _remember(url, params, headers, r, df)
+
+
+def _conditional_get(url: str, params: dict, headers: dict, timeout: int):
+    """GET with If-None-Match; returns (response, None) or (None, cached frame) on 304."""
+    key = (url, tuple(sorted(params.items())), headers.get("Accept"))
+    hit = _revalidate.get(key)
+    if hit is not None:
+        headers = {**headers, "If-None-Match": hit[0]}
+    r = requests.get(url, params=params, headers=headers, timeout=timeout)
+    if r.status_code == 304 and hit is not None:
+        _revalidate.move_to_end(key)
+        return None, hit[1].copy(deep=False)
+    return r, None
+
+
+def _remember(url: str, params: dict, headers: dict, r, df: pd.DataFrame) -> pd.DataFrame:
+    etag = r.headers.get("etag")
+    if etag:
+        _revalidate[(url, tuple(sorted(params.items())), headers.get("Accept"))] = (etag, df)
+        while len(_revalidate) > _REVALIDATE_MAX:
+            _revalidate.popitem(last=False)
+    return df.copy(deep=False)
+
+
+def arrow_to_frame(body: bytes) -> pd.DataFrame:
+    """Arrow IPC stream bytes -> DataFrame, reusing the Arrow buffers where possible."""
+    table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def api_get_timeseries_batch(
+    region: str,
+    metric_keys: list[str],
+    resolution: str,
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    api_base: str = DEFAULT_API_BASE,
+    timeout: int = 30,
+) -> pd.DataFrame:
+    """
+    Calls backend:
+      GET /timeseries/batch?region=DE&metrics=load,wind,solar,renew_share&resolution=hour&start=...&end=...
+
+    Returns one DataFrame aligned on ts with one column per metric.
+    """
+    url = f"{api_base.rstrip('/')}/timeseries/batch"
+    params = {
+        "region": region,
+        "metrics": ",".join(metric_keys),
+        "resolution": resolution,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "shape": "columnar",
+    }
+    headers = {"Accept": "application/json"}
+    r, cached = _conditional_get(url, params, headers, timeout)
+    if cached is not None:
+        return cached
+
+    if r.status_code != 200:
+        raise RuntimeError(
+            f"API error {r.status_code} from {r.url}\n"
+            f"Body preview:\n{(r.text or '')[:500]}"
+        )
+
+    df = pd.DataFrame(r.json())
+    if not df.empty:
+        df["ts"] = pd.to_datetime(df["ts"])
+    return _remember(url, params, headers, r, df)
 
 
 def get_timeseries(
@@ -78,6 +185,140 @@ def get_timeseries(
     start: pd.Timestamp,
     end: pd.Timestamp,
     api_base: str = DEFAULT_API_BASE,
+    max_points: int | None = DEFAULT_MAX_POINTS,
+    bucket: str | None = None,
+    agg: str = "mean",
 ) -> pd.DataFrame:
-    """API-only: no synthetic fallback."""
-    return api_get_timeseries(region, metric_key, resolution, start, end, api_base=api_base)
+    """
+    API-only: no synthetic fallback. Downsampled server-side to max_points (None = raw).
+    bucket/agg (e.g. "6h", "max") aggregate server-side before anything is sent.
+    """
+    if metric_key in DERIVED_METRICS:
+        df = api_get_timeseries_batch(region, [metric_key], resolution, start, end, api_base=api_base)
+        if df.empty:
+            return df
+        df = df[["ts", metric_key]].rename(columns={metric_key: "value"}).dropna()
+        # derived metrics are computed on aligned rows, so they are bucketed here
+        return bucket_locally(df, bucket, agg) if bucket else df
+    return api_get_timeseries(
+        region, metric_key, resolution, start, end,
+        api_base=api_base, max_points=max_points, bucket=bucket, agg=agg,
+    )
+
+
+def bucket_locally(df: pd.DataFrame, bucket: str, agg: str) -> pd.DataFrame:
+    """Same buckets as the API (fixed length, aligned to the UTC epoch)."""
+    r = df.set_index("ts")["value"].resample(pd.Timedelta(bucket), origin="epoch")
+    out = r.quantile(0.95) if agg == "p95" else r.agg(agg)
+    return out.dropna().rename("value").reset_index()
+
+
+STATS_QUANTILES = (0.25, 0.5, 0.75)
+
+
+def api_get_stats(
+    region: str,
+    metric_key: str,
+    resolution: str,
+    windows: list[tuple[pd.Timestamp, pd.Timestamp]],
+    api_base: str = DEFAULT_API_BASE,
+    timeout: int = 30,
+) -> pd.DataFrame:
+    """
+    Calls backend:
+      GET /stats?region=DE&metric=load&resolution=hour&window=<start>/<end>&window=...
+
+    One row per window, describe()-style columns:
+      count, mean, std, min, 25%, 50%, 75%, max, last, last_ts
+    """
+    url = f"{api_base.rstrip('/')}/stats"
+    params = {
+        "region": region,
+        "metric": metric_key,
+        "resolution": resolution,
+        "window": [f"{s.isoformat()}/{e.isoformat()}" for s, e in windows],
+        "q": list(STATS_QUANTILES),
+    }
+    r = requests.get(url, params=params, timeout=timeout)
+    if r.status_code != 200:
+        raise RuntimeError(
+            f"API error {r.status_code} from {r.url}\n"
+            f"Body preview:\n{(r.text or '')[:500]}"
+        )
+
+    rows = []
+    for w in r.json():
+        quantiles = {f"{float(q):.0%}": v for q, v in w.pop("quantiles").items()}
+        rows.append({**w, **quantiles})
+    return _stats_frame(pd.DataFrame(rows))
+
+
+def _stats_frame(df: pd.DataFrame) -> pd.DataFrame:
+    cols = ["count", "mean", "std", "min", *[f"{q:.0%}" for q in STATS_QUANTILES], "max", "last", "last_ts"]
+    df["last_ts"] = pd.to_datetime(df["last_ts"], utc=True)
+    return df[cols]
+
+
+def get_stats(
+    region: str,
+    metric_key: str,
+    resolution: str,
+    windows: list[tuple[pd.Timestamp, pd.Timestamp]],
+    api_base: str = DEFAULT_API_BASE,
+) -> pd.DataFrame:
+    """Window statistics from /stats; derived metrics are summarized from their full-resolution rows."""
+    if metric_key not in DERIVED_METRICS:
+        return api_get_stats(region, metric_key, resolution, windows, api_base=api_base)
+
+    rows = []
+    for start, end in windows:
+        v = get_timeseries(region, metric_key, resolution, start, end, api_base=api_base, max_points=None)
+        v = v.dropna(subset=["value"]) if not v.empty else v
+        values = v["value"] if not v.empty else pd.Series(dtype=float)
+        rows.append({
+            "count": int(values.count()),
+            "mean": values.mean(),
+            "std": values.std(),
+            "min": values.min(),
+            **{f"{q:.0%}": values.quantile(q) for q in STATS_QUANTILES},
+            "max": values.max(),
+            "last": values.iloc[-1] if len(values) else None,
+            "last_ts": v["ts"].iloc[-1] if len(values) else None,
+        })
+    return _stats_frame(pd.DataFrame(rows))
+
+
+def get_events(
+    region: str,
+    metric_key: str,
+    resolution: str,
+    threshold: float,
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    op: str = "above",
+    api_base: str = DEFAULT_API_BASE,
+    timeout: int = 30,
+) -> pd.DataFrame:
+    """
+    Calls backend:
+      GET /events?region=..&metric=..&resolution=..&threshold=..&op=..&start=...&end=...
+
+    Exceedance intervals (start, end, duration, peak) inside the window, newest first.
+    Computed per request for the given threshold; no alert rule is registered.
+    """
+    r = requests.get(
+        f"{api_base.rstrip('/')}/events",
+        params={
+            "region": region, "metric": metric_key, "resolution": resolution,
+            "threshold": threshold, "op": op, "start": start.isoformat(), "end": end.isoformat(),
+        },
+        timeout=timeout,
+    )
+    if r.status_code != 200:
+        raise RuntimeError(f"API error {r.status_code} from {r.url}\nBody preview:\n{(r.text or '')[:500]}")
+
+    df = pd.DataFrame(r.json(), columns=["start", "end", "duration_s", "peak", "peak_ts", "points"])
+    for col in ["start", "end", "peak_ts"]:
+        df[col] = pd.to_datetime(df[col], utc=True)
+    df["duration"] = pd.to_timedelta(df["duration_s"], unit="s")
+    return df[["start", "end", "duration", "peak", "peak_ts", "points"]]